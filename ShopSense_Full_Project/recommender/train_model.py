@@ -8,8 +8,12 @@ def train():
     df = pd.read_csv('data/processed/transactions.csv')
     df['Quantity'] = df['Quantity'].astype(float)
 
-    users = df['CustomerID'].astype("category").cat.codes
-    items = df['StockCode'].astype("category").cat.codes
+    # Prefer the shared int32 ids written by the top-level ETL so rows/cols match serving
+    if {'user_idx', 'item_idx'} <= set(df.columns):
+        users, items = df['user_idx'], df['item_idx']
+    else:
+        users = df['CustomerID'].astype("category").cat.codes
+        items = df['StockCode'].astype("category").cat.codes
 
     matrix = csr_matrix((df['Quantity'], (users, items)))
     model = AlternatingLeastSquares(factors=50)
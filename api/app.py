@@ -1,87 +1,339 @@
-import os
-from fastapi import FastAPI
-import pickle, numpy as np
+import os, time
+from pathlib import Path
+from fastapi import FastAPI, Query, Request, Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+import numpy as np
 import pandas as pd
 
+from api import encoding
+from api.batching import MicroBatcher
+from api.tracing import TRACING, TracingMiddleware
+from etl.aggregates import load_aggregates
+from etl.id_maps import load_id_maps
+from etl.store import catalog_frame, open_store
+from etl.user_profiles import load_user_profiles
+from recommender.catalog import load_catalog, merged_catalog
+from recommender.engine import Recommender, load_recommender
+from recommender.filters import ItemFilters
+from recommender.materialize import load_materialized
+from recommender.price_model import load_price_model
+from recommender.rerank import CANDIDATE_FACTOR, METHODS, rerank
+from recommender.session import SessionRecommender
+from recommender.shared_model import ensure_published, process_memory
+from recommender.tracing import span
+
 app = FastAPI()
+if TRACING:
+    # Request IDs, per-stage spans and the slow-request log (see api/tracing.py)
+    app.add_middleware(TracingMiddleware)
 
 # Absolute paths for Vercel
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASE_DIR = os.getenv("SHOPSENSE_HOME") or os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 MODEL_PATH = os.path.join(BASE_DIR, "models", "recommender.pkl")
-DATA_PATH = os.path.join(BASE_DIR, "data", "processed", "user_item_matrix.csv")
+PRICE_MODEL_PATH = os.path.join(BASE_DIR, "models", "price_model.npz")
+ID_MAP_DIR = os.path.join(BASE_DIR, "data", "processed", "id_maps")
+AGG_DIR = os.path.join(BASE_DIR, "data", "processed", "aggregates")
+STORE_PATH = os.path.join(BASE_DIR, "data", "processed", "shopsense.db")
+SHARED_DIR = os.path.join(BASE_DIR, "models", "shared")
+PRODUCTS_PATH = os.path.join(BASE_DIR, "data", "processed", "products.csv")
+RAW_PRODUCTS_PATH = os.path.join(BASE_DIR, "data", "raw", "products.csv")
+INTERACTIONS_PATH = os.path.join(BASE_DIR, "data", "raw", "interactions.csv")
+MATERIALIZED_PATH = os.path.join(BASE_DIR, "models", "materialized.npz")
+# Set SHOPSENSE_SHARED_MODEL=1 when running several workers: model arrays and the products
+# payload are then memory-mapped from one published copy instead of loaded per process
+SHARED_MODEL = os.getenv("SHOPSENSE_SHARED_MODEL", "0") == "1"
+# Set SHOPSENSE_BATCH_WINDOW_MS (e.g. 2) to coalesce concurrent plain /recommend calls into
+# batches of up to SHOPSENSE_BATCH_MAX users; 0 scores every request on its own
+BATCH_WINDOW_MS = float(os.getenv("SHOPSENSE_BATCH_WINDOW_MS", "0"))
+BATCH_MAX = int(os.getenv("SHOPSENSE_BATCH_MAX", "64"))
+# Set SHOPSENSE_MATERIALIZED=1 to answer known, unchanged users from the table written by
+# `python -m recommender.materialize`; everyone else is scored live
+MATERIALIZED = os.getenv("SHOPSENSE_MATERIALIZED", "0") == "1"
+# Largest page /products/search returns; anything outside 1..MAX_SEARCH_LIMIT is rejected with a 422
+MAX_SEARCH_LIMIT = 200
 
 ## 📦 Model & Data Preloading
 model = None
+engine = None
+shared = None
 products_cache = []
 categories_cache = ["General"]
+catalog = None
+
+# Shared CustomerID/StockCode -> int32 dictionaries written by the ETL
+user_ids, item_ids = load_id_maps(ID_MAP_DIR)
+# Popularity / trending / co-occurrence tables precomputed by the ETL (None until it has run)
+aggregates = load_aggregates(AGG_DIR)
 
 try:
-    if os.path.exists(MODEL_PATH):
-        model = pickle.load(open(MODEL_PATH, "rb"))
-        print("✅ Model loaded successfully")
+    # Same scoring code as the Streamlit app's embedded mode
+    if SHARED_MODEL:
+        shared = ensure_published(MODEL_PATH, SHARED_DIR, PRODUCTS_PATH)
+        engine = Recommender(shared.model, user_ids, item_ids, aggregates) if shared is not None else None
+    else:
+        engine = load_recommender(MODEL_PATH, id_maps=(user_ids, item_ids), aggregates=aggregates)
+    if engine is not None:
+        model = engine.model
+        print(f"✅ Model loaded successfully ({'shared memory map' if shared else 'private copy'})")
+        if MATERIALIZED:
+            engine.materialized = load_materialized(engine, MATERIALIZED_PATH)
+            if engine.materialized is not None:
+                print(f"✅ Materialized recommendations loaded ({engine.materialized.n_stale} stale users scored live)")
 except Exception as e:
     print(f"❌ Error loading model: {e}")
+# Ridge price model trained by `python -m recommender.price_model`
+price_model = load_price_model(PRICE_MODEL_PATH)
+# Co-occurrence based suggestions for the items viewed in a session
+session_recommender = SessionRecommender(aggregates, item_ids) if aggregates is not None else None
+# Per-user profile arrays (purchase count, AOV, top categories, price bands) indexed by user_idx
+profiles = load_user_profiles(AGG_DIR)
+# Optional indexed SQLite store for per-user / per-product lookups (built with `etl_pipeline --store`)
+store = open_store(STORE_PATH)
 
 try:
-    products_path = os.path.join(BASE_DIR, "data", "processed", "products.csv")
+    products_path = PRODUCTS_PATH
     if os.path.exists(products_path):
         df = pd.read_csv(products_path)
-        products_cache = df.to_dict("records")
+        if shared is None:
+            # With a shared model, /products is served from the published JSON instead
+            products_cache = df.to_dict("records")
         if "Category" in df.columns:
             categories_cache = sorted(df["Category"].unique().tolist())
             if "All" not in categories_cache:
                 categories_cache = ["All"] + categories_cache
-        print(f"✅ Loaded {len(products_cache)} products and {len(categories_cache)} categories")
+        print(f"✅ Loaded {len(df)} products and {len(categories_cache)} categories")
+    # Catalog index with the precomputed similar-products table. Once the ETL has built the id
+    # maps it holds the store's products table (real prices from the raw products, mean
+    # interaction ratings, 'General' for uncategorized items), so the store, search, similar
+    # products and the /recommend filters all quote one price and rating per item.
+    if len(item_ids):
+        products = catalog_frame(user_ids, item_ids, [RAW_PRODUCTS_PATH, PRODUCTS_PATH], INTERACTIONS_PATH)
+        catalog = merged_catalog(products)
+        # Category / price masks for constrained /recommend calls
+        if engine is not None:
+            engine.filters = ItemFilters.from_products(products, item_ids)
+    else:
+        catalog = load_catalog(Path(products_path))
 except Exception as e:
     print(f"❌ Error loading products: {e}")
 
+def _score_batch(keys):
+    """MicroBatcher callback: `keys` are (user_id, n) pairs, scored together per distinct n."""
+    results = [None] * len(keys)
+    by_n = {}
+    for i, (_, n) in enumerate(keys):
+        by_n.setdefault(n, []).append(i)
+    for n, positions in by_n.items():
+        for i, scored in zip(positions, engine.recommend_scored_many([keys[i][0] for i in positions], n)):
+            results[i] = scored
+    return results
+
+batcher = MicroBatcher(_score_batch, BATCH_WINDOW_MS, BATCH_MAX) if BATCH_WINDOW_MS > 0 and engine is not None else None
+
 @app.get("/api/status")
 def home():
     return {
         "status": "online",
         "message": "ShopSense AI Recommendation API is running",
         "model_loaded": model is not None,
-        "products_count": len(products_cache)
+        "store_loaded": store is not None,
+        "model_memory": "shared" if shared is not None else "private",
+        "model_precision": model.get("precision", "float64") if model is not None else None,
+        "products_count": shared.products_count if shared is not None else len(products_cache),
+        "pid": os.getpid(),
+        "memory": process_memory(),
+        "batching": batcher is not None,
+        "materialized": None if engine is None or engine.materialized is None else {
+            "widths": sorted(engine.materialized.widths), "stale_users": engine.materialized.n_stale}
     }
 
+@app.get("/api/batching")
+def batching_stats():
+    """Micro-batching settings and the batch sizes achieved so far in this worker."""
+    if batcher is None:
+        return {"enabled": False, "window_ms": BATCH_WINDOW_MS, "max_batch": BATCH_MAX}
+    return dict(batcher.stats(), enabled=True)
+
+def _codes(text):
+    return [c for c in (text or "").split(",") if c]
+
+def _server_timing(timings):
+    return ", ".join(f"{name};dur={ms:.3f}" for name, ms in timings.items())
+
 @app.get("/recommend/{user_id}")
-def recommend(user_id: int, n: int = 10):
-    if model is None:
+async def recommend(user_id: int, n: int = 10, items: str = None, category: str = None, min_price: float = None,
+                    max_price: float = None, exclude: str = None, diversify: str = None, diversity: float = 0.5,
+                    request: Request = None):
+    """
+    `items` (comma separated StockCodes) seeds the cold-start answer for users the model
+    cannot score. `category`, `min_price`/`max_price` and `exclude` (comma separated
+    StockCodes) constrain the items returned. `diversify` ("mmr" or "quota") re-ranks
+    CANDIDATE_FACTOR x n candidates, trading relevance for category spread by `diversity`
+    (0 = pure relevance, 1 = maximum spread). Stage latencies are sent in a Server-Timing
+    header. JSON unless the Accept header asks for msgpack or packed arrays.
+
+    Without constraints or seed items, and with micro-batching enabled, scoring goes through
+    the batcher together with other requests arriving in the same window.
+    """
+    media = encoding.negotiate(request.headers.get("accept") if request is not None else None)
+    if engine is None:
         return {"error": "Model not trained."}
+    if engine.filters is not None and not engine.filters.has_category(category):
+        return {"error": f"Unknown category {category}."}
+    if diversify is not None and (diversify not in METHODS or engine.filters is None):
+        return {"error": f"diversify must be one of {', '.join(METHODS)} and needs the product catalog."}
 
-    users = model.get("users", [])
-    if user_id not in users:
+    start = time.perf_counter()
+    candidates = n * CANDIDATE_FACTOR if diversify else n
+    plain = not (items or exclude or min_price is not None or max_price is not None or category not in (None, "All"))
+    if batcher is not None and plain:
+        with span("batch_wait"):
+            scored = await batcher.submit((user_id, candidates))
+    else:
+        scored = await run_in_threadpool(engine.recommend_scored, user_id, candidates, _codes(items), category,
+                                         min_price, max_price, _codes(exclude))
+    if scored is None:
         return {"error": f"User {user_id} not found in database. Try IDs like 10001, 10002..."}
+    recommended, scores, source = scored
+    timings = {"score": (time.perf_counter() - start) * 1000}
+    if diversify:
+        start = time.perf_counter()
+        with span("rerank"):
+            recommended, scores = rerank(diversify, recommended, scores, engine.filters.item_category, n,
+                                         min(max(diversity, 0.0), 1.0))
+        timings["rerank"] = (time.perf_counter() - start) * 1000
+    headers = {"Server-Timing": _server_timing(timings)}
+    # Rendered here rather than by FastAPI after returning, so the span covers encoding
+    with span("serialization"):
+        if media == encoding.PACKED:
+            return Response(content=encoding.pack_recommendations(recommended, scores), media_type=media,
+                            headers=dict(headers, **{"X-Recommendation-Source": source}))
+        payload = {
+            "user": user_id,
+            "top_n": n,
+            "source": source,
+            "recommendations": item_ids.decode(recommended).tolist()
+        }
+        if diversify:
+            payload["diversify"] = {"method": diversify, "diversity": diversity}
+        if media == encoding.MSGPACK:
+            return Response(content=encoding.pack_msgpack(dict(payload, scores=scores.tolist())), media_type=media,
+                            headers=headers)
+        return JSONResponse(payload, headers=headers)
 
-    idx = users.index(user_id)
-    sim = model["similarity"][idx]
-    top_sim_users = np.argsort(sim)[-n-1:-1][::-1]
-
-    # Load matrix only when needed or keep in memory if small
-    uif = pd.read_csv(DATA_PATH)
-    mat = uif.iloc[:, 1:].values
-    product_ids = list(uif.columns[1:])
+class BatchRequest(BaseModel):
+    users: list[int]
+    n: int = 10
 
-    recommended = set()
-    for u in top_sim_users:
-        user_row = mat[u]
-        top_items = np.where(user_row > 0)[0]
-        for item_idx in top_items:
-            recommended.add(product_ids[item_idx])
-            if len(recommended) >= n: break
-        if len(recommended) >= n: break
-
-    return {
-        "user": user_id,
-        "top_n": n,
-        "recommendations": list(recommended)[:n]
-    }
+@app.post("/recommend/batch")
+def recommend_batch(req: BatchRequest, request: Request = None):
+    media = encoding.negotiate(request.headers.get("accept") if request is not None else None)
+    if engine is None:
+        return {"error": "Model not trained."}
+    rows = engine.recommend_scored_many(req.users, req.n)
+    empty = (np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32))
+    items = [r[0] if r is not None else empty[0] for r in rows]
+    scores = [r[1] if r is not None else empty[1] for r in rows]
+    if media == encoding.PACKED:
+        offsets = np.concatenate([[0], np.cumsum([len(i) for i in items])])
+        body = encoding.pack_batch(offsets, np.concatenate(items or [empty[0]]), np.concatenate(scores or [empty[1]]))
+        return Response(content=body, media_type=media)
+    results = [{"user": u, "source": r[2], "recommendations": item_ids.decode(i).tolist()} if r is not None
+               else {"user": u, "error": "User not found."} for u, i, r in zip(req.users, items, rows)]
+    if media == encoding.MSGPACK:
+        for result, r in zip(results, rows):
+            if r is not None:
+                result["scores"] = r[1].tolist()
+        return Response(content=encoding.pack_msgpack({"top_n": req.n, "results": results}), media_type=media)
+    return {"top_n": req.n, "results": results}
 
 @app.get("/products")
 def get_products():
+    payload = shared.products_json() if shared is not None else None
+    if payload is not None:
+        return Response(content=payload, media_type="application/json")
     return products_cache
 
+@app.get("/products/search")
+def search_products(q: str, limit: int = Query(20, ge=1, le=MAX_SEARCH_LIMIT), category: str = "All"):
+    if catalog is None:
+        return {"error": "Catalog not loaded."}
+    return {"query": q, "results": catalog.search(q, limit, category).to_dict("records")}
+
+@app.get("/products/{code}")
+def get_product(code: str):
+    if store is not None:
+        product = store.product(code)
+    else:
+        rows = catalog.rows([code]).to_dict("records") if catalog is not None else []
+        product = rows[0] if rows else None
+    return product or {"error": f"Product {code} not found."}
+
+@app.get("/products/{code}/similar")
+def get_similar_products(code: str, k: int = 4):
+    if catalog is None:
+        return {"error": "Catalog not loaded."}
+    return {"product": code, "similar": catalog.similar(code, k)}
+
+@app.get("/users/{user_id}/history")
+def get_user_history(user_id: int, limit: int = 100):
+    if store is None:
+        return {"error": "Store not built. Run the ETL with --store."}
+    return {"user": user_id, "history": store.user_history(user_id, limit)}
+
+@app.get("/users/{user_id}/profile")
+def get_user_profile(user_id: int):
+    if profiles is None:
+        return {"error": "User profiles not built. Run the ETL first."}
+    profile = profiles.get(user_ids.get(user_id))
+    if profile is None:
+        return {"error": f"User {user_id} not found."}
+    return dict(profile, user=user_id)
+
+@app.get("/session/recommend")
+def recommend_for_session(items: str = "", n: int = 6):
+    """`items` is a comma separated list of viewed StockCodes, oldest first."""
+    if session_recommender is None:
+        return {"error": "Aggregates not built. Run the ETL first."}
+    viewed = [c for c in items.split(",") if c]
+    return {"viewed": viewed, "recommendations": session_recommender.recommend(viewed, n)}
+
+class PriceRequest(BaseModel):
+    items: list[str] = []
+    # Feature rows for products the model has not seen, as parallel arrays
+    category: list[str] = []
+    rating: list[float | None] = []
+
+@app.post("/predict_price")
+def predict_price(req: PriceRequest):
+    if price_model is None:
+        return {"error": "Price model not trained. Run python -m recommender.price_model."}
+    if req.rating and len(req.rating) != len(req.category):
+        return {"error": "rating must have one value per category."}
+    known = price_model.predict_items(item_ids.encode(req.items)) if req.items else []
+    new = []
+    if req.category:
+        rating = [np.nan if r is None else r for r in req.rating] or np.nan
+        new = price_model.predict(req.category, rating)
+    return {
+        "items": {code: None if np.isnan(p) else float(p) for code, p in zip(req.items, known)},
+        "predictions": [float(p) for p in new],
+    }
+
 @app.get("/categories")
 def get_categories():
     return categories_cache
 
+@app.get("/popular")
+def get_popular(n: int = 10, category: str = None):
+    if aggregates is None:
+        return {"error": "Aggregates not built. Run the ETL first."}
+    return {"category": category or "All", "items": item_ids.decode(aggregates.popular(n, category)).tolist()}
+
+@app.get("/trending")
+def get_trending(n: int = 10):
+    if aggregates is None:
+        return {"error": "Aggregates not built. Run the ETL first."}
+    return {"items": item_ids.decode(aggregates.trending(n)).tolist()}
@@ -0,0 +1,74 @@
+"""
+Coalescing of concurrent requests into one batched call.
+
+Requests that arrive within `window_ms` of the first one in a batch, up to `max_batch`
+of them, are handed to `fn` together. `fn` takes a list of keys and returns one result
+per key; it runs in the threadpool so the event loop keeps accepting requests meanwhile.
+Each waiting request then gets its own result back.
+"""
+import asyncio, contextvars, time
+from collections import Counter
+from starlette.concurrency import run_in_threadpool
+
+
+class MicroBatcher:
+    def __init__(self, fn, window_ms=2.0, max_batch=64):
+        self.fn = fn
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._pending = []
+        self._timer = None
+        self.requests = 0
+        self.batches = 0
+        self.sizes = Counter()
+        self.busy_s = 0.0
+
+    async def submit(self, key):
+        """Queue `key` for the next batch and wait for its result."""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((key, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            # A fresh context: the batch serves several requests, so it must not inherit one's trace
+            asyncio.get_running_loop().create_task(self._run(batch), context=contextvars.Context())
+
+    async def _run(self, batch):
+        keys = [key for key, _ in batch]
+        start = time.perf_counter()
+        try:
+            results = await run_in_threadpool(self.fn, keys)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self.busy_s += time.perf_counter() - start
+        self.requests += len(batch)
+        self.batches += 1
+        self.sizes[len(batch)] += 1
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self):
+        return {
+            "window_ms": self.window * 1000,
+            "max_batch": self.max_batch,
+            "requests": self.requests,
+            "batches": self.batches,
+            "mean_batch_size": self.requests / self.batches if self.batches else 0.0,
+            "max_batch_size": max(self.sizes, default=0),
+            "batch_sizes": {str(size): count for size, count in sorted(self.sizes.items())},
+            "mean_batch_ms": self.busy_s / self.batches * 1000 if self.batches else 0.0,
+        }
@@ -0,0 +1,92 @@
+"""
+Response encodings for high-volume recommendation clients, chosen through the Accept header.
+
+- application/json (default): the usual response with StockCode strings
+- application/msgpack: the same fields as JSON, MessagePack encoded (only offered if the
+  optional `msgpack` package is installed)
+- application/x-shopsense-packed: raw little-endian arrays of int32 item indices (rows of
+  data/processed/id_maps/items.csv) and float32 scores, with no per-item encoding work
+
+Packed layout, single user:  b"SSR1" | uint32 n | int32[n] items | float32[n] scores
+Packed layout, batch:        b"SSRB" | uint32 users | int32[users + 1] offsets | int32[total] items | float32[total] scores
+A user's items are items[offsets[i]:offsets[i + 1]]; unknown users get an empty row.
+"""
+import struct
+import numpy as np
+
+try:
+    import msgpack
+except ImportError:  # optional dependency
+    msgpack = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+PACKED = "application/x-shopsense-packed"
+SINGLE_MAGIC, BATCH_MAGIC = b"SSR1", b"SSRB"
+
+
+def supported():
+    return [JSON, PACKED] + ([MSGPACK] if msgpack is not None else [])
+
+
+def negotiate(accept):
+    """
+    Best supported media type for an Accept header value; JSON when absent or nothing else
+    matches. Ranges with q=0 (or a malformed q) are refused, not just ranked last.
+    """
+    if not accept:
+        return JSON
+    offers = []
+    for i, part in enumerate(accept.split(",")):
+        media, *params = [p.strip() for p in part.split(";")]
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            offers.append((-q, i, media.lower()))
+    for _, _, media in sorted(offers):
+        if media in ("application/x-msgpack", "application/vnd.msgpack"):
+            media = MSGPACK
+        if media in supported() and media != JSON:
+            return media
+        if media in (JSON, "application/*", "*/*"):
+            return JSON
+    return JSON
+
+
+def pack_recommendations(items, scores):
+    items = np.ascontiguousarray(items, dtype="<i4")
+    return SINGLE_MAGIC + struct.pack("<I", len(items)) + items.tobytes() + np.ascontiguousarray(scores, dtype="<f4").tobytes()
+
+
+def unpack_recommendations(data):
+    if data[:4] != SINGLE_MAGIC:
+        raise ValueError("not a packed single-user response")
+    (n,) = struct.unpack_from("<I", data, 4)
+    items = np.frombuffer(data, dtype="<i4", count=n, offset=8)
+    return items, np.frombuffer(data, dtype="<f4", count=n, offset=8 + 4 * n)
+
+
+def pack_batch(offsets, items, scores):
+    offsets = np.ascontiguousarray(offsets, dtype="<i4")
+    return (BATCH_MAGIC + struct.pack("<I", len(offsets) - 1) + offsets.tobytes()
+            + np.ascontiguousarray(items, dtype="<i4").tobytes() + np.ascontiguousarray(scores, dtype="<f4").tobytes())
+
+
+def unpack_batch(data):
+    if data[:4] != BATCH_MAGIC:
+        raise ValueError("not a packed batch response")
+    (users,) = struct.unpack_from("<I", data, 4)
+    offsets = np.frombuffer(data, dtype="<i4", count=users + 1, offset=8)
+    total = int(offsets[-1])
+    start = 8 + 4 * (users + 1)
+    items = np.frombuffer(data, dtype="<i4", count=total, offset=start)
+    return offsets, items, np.frombuffer(data, dtype="<f4", count=total, offset=start + 4 * total)
+
+
+def pack_msgpack(payload):
+    return msgpack.packb(payload, use_bin_type=True)
@@ -0,0 +1,68 @@
+"""
+Lightweight per-request tracing for the API.
+
+TracingMiddleware runs every request under a Trace (see recommender/tracing.py): a
+request ID, taken from an incoming X-Request-ID header or generated, and the spans that
+code anywhere in the call path records with `with span("name"):`.
+
+Finished requests are logged as one JSON line on the "shopsense.api" logger:
+- always, as "slow_request", when they take SHOPSENSE_SLOW_MS or longer (default 250)
+- otherwise, as "request", for a SHOPSENSE_TRACE_SAMPLE fraction of them (default 0)
+
+SHOPSENSE_TRACING=0 turns the middleware off.
+"""
+import json, logging, os, random, sys, time
+
+from recommender.tracing import traced
+
+TRACING = os.getenv("SHOPSENSE_TRACING", "1") == "1"
+SLOW_MS = float(os.getenv("SHOPSENSE_SLOW_MS", "250"))
+SAMPLE_RATE = float(os.getenv("SHOPSENSE_TRACE_SAMPLE", "0"))
+
+logger = logging.getLogger("shopsense.api")
+if not logger.handlers:
+    _handler = logging.StreamHandler(sys.stderr)
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+def log_request(trace, method, path, status, duration_ms, slow_ms=SLOW_MS, sample_rate=SAMPLE_RATE):
+    slow = duration_ms >= slow_ms
+    if not slow and (sample_rate <= 0 or random.random() >= sample_rate):
+        return False
+    record = {"event": "slow_request" if slow else "request", "request_id": trace.request_id, "method": method,
+              "path": path, "status": status, "duration_ms": round(duration_ms, 3), "spans": trace.totals()}
+    logger.log(logging.WARNING if slow else logging.INFO, json.dumps(record))
+    return True
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware: trace each HTTP request, return its ID in X-Request-ID and log it if slow
+    or sampled. Plain ASGI rather than BaseHTTPMiddleware, so no extra task per request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        request_id = next((v.decode("latin-1") for k, v in scope["headers"] if k == b"x-request-id"), None)
+        status = 500
+
+        with traced(request_id) as trace:
+            async def send_with_id(message):
+                nonlocal status
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"x-request-id", trace.request_id.encode("latin-1"))]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_id)
+            finally:
+                log_request(trace, scope["method"], scope["path"], status, (time.perf_counter() - trace.start) * 1000)
@@ -0,0 +1,73 @@
+"""
+HTTP client for the ShopSense API, used by the Streamlit app.
+
+One persistent requests.Session with a bounded connection pool, per-call timeouts and
+retries with exponential backoff on connection errors and 502/503/504. Independent
+calls run concurrently on a small thread pool, and each result carries its own latency.
+"""
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+Result = namedtuple("Result", ["value", "error", "ms"])
+
+
+class ApiError(Exception):
+    """The API answered, but with an error payload or status."""
+
+
+def base_url(api_url):
+    """API root from API_URL, which historically pointed at the /recommend route."""
+    url = api_url.rstrip("/")
+    return url[: -len("/recommend")] if url.endswith("/recommend") else url
+
+
+class ApiClient:
+    def __init__(self, api_url, timeout=(2, 5), retries=2, backoff=0.25, pool_size=8):
+        self.base = base_url(api_url)
+        self.timeout = timeout  # (connect, read) seconds
+        retry = Retry(total=retries, connect=retries, read=retries, status=retries, backoff_factor=backoff,
+                      status_forcelist=(502, 503, 504), allowed_methods=frozenset({"GET"}))
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.pool = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="shopsense-api")
+
+    def get(self, path, **params):
+        try:
+            resp = self.session.get(self.base + path, params=params, timeout=self.timeout)
+            resp.raise_for_status()
+            body = resp.json()
+        except requests.RequestException as e:
+            raise ApiError(f"GET {path} failed: {e}") from e
+        except ValueError as e:
+            raise ApiError(f"GET {path} returned invalid JSON") from e
+        if isinstance(body, dict) and "error" in body:
+            raise ApiError(body["error"])
+        return body
+
+    def recommend(self, user_id, n=10):
+        return self.get(f"/recommend/{user_id}", n=n)["recommendations"]
+
+    def similar(self, code, k=4):
+        return self.get(f"/products/{code}/similar", k=k)["similar"]
+
+    def history(self, user_id, limit=100):
+        return self.get(f"/users/{user_id}/history", limit=limit)["history"]
+
+    def _timed(self, fn, *args):
+        start = time.perf_counter()
+        try:
+            return Result(fn(*args), None, (time.perf_counter() - start) * 1000)
+        except ApiError as e:
+            return Result(None, e, (time.perf_counter() - start) * 1000)
+
+    def gather(self, calls):
+        """Run {name: (fn, *args)} concurrently; returns {name: Result} once all have finished."""
+        futures = {name: self.pool.submit(self._timed, *call) for name, call in calls.items()}
+        return {name: f.result() for name, f in futures.items()}
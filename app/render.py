@@ -0,0 +1,128 @@
+"""
+Column-wise HTML builders for the Streamlit product sections.
+
+Each builder turns a whole DataFrame into one HTML string with vectorized pandas
+string operations (no iterrows, no per-card string +=), so a section is sent to the
+browser as a single markdown/component call.
+"""
+import numpy as np
+import pandas as pd
+
+
+def _text(values):
+    """HTML-escaped strings for a column."""
+    s = pd.Series(values).astype(str)
+    return (s.str.replace("&", "&amp;", regex=False).str.replace("<", "&lt;", regex=False)
+             .str.replace(">", "&gt;", regex=False).str.replace('"', "&quot;", regex=False))
+
+
+def _stars(rating):
+    n = pd.to_numeric(pd.Series(rating), errors="coerce").fillna(0).round().clip(0, 5).astype(int)
+    return pd.Series("★", index=n.index).str.repeat(n)
+
+
+def _num(values):
+    """Numbers formatted like the old f-strings (`{value}`), with blanks for missing values."""
+    s = pd.Series(values)
+    return s.astype(str).where(s.notna(), "")
+
+
+def _join(parts):
+    return "".join(parts.tolist())
+
+
+def product_cards(df):
+    """Gallery cards, one per row."""
+    if df.empty:
+        return ""
+    df = df.reset_index(drop=True)
+    cards = (
+        '<div class="card"><div class="flex">'
+        '<img src="' + _text(df["ImageURL"]) + '" width="120" class="product-image" />'
+        '<div style="flex: 1;">'
+        '<div class="product-name">' + _text(df["Description"]) + '</div>'
+        '<div class="small-muted">' + _text(df["Category"]) + ' • ID: ' + _text(df["StockCode"]) + '</div>'
+        '<div style="margin-top:8px;">'
+        '<span class="price">₹' + _num(df["Price"]) + '</span>'
+        '&nbsp;&nbsp;<span class="rating">' + _stars(df["Rating"]) + '</span>'
+        '&nbsp;&nbsp;<span class="small-muted">(' + _num(df["Rating"]) + '/5)</span>'
+        '</div></div></div></div>'
+    )
+    return _join(cards)
+
+
+def mini_cards(df, width=180, truncate=30, meta="category", show_rating=False):
+    """
+    A horizontally scrolling strip of small cards (recently viewed, similar products).
+    `meta` picks the muted line: "category", "category_price" or "price_rating".
+    """
+    if df.empty:
+        return ""
+    df = df.reset_index(drop=True)
+    name = _text(df["Description"])
+    if truncate:
+        name = _text(df["Description"].astype(str).str.slice(0, truncate)) + "..."
+    if meta == "price_rating":
+        meta = "₹" + _num(df["Price"]) + " • " + _num(df["Rating"]) + "/5"
+    elif meta == "category_price":
+        meta = _text(df["Category"]) + " • ₹" + _num(df["Price"])
+    else:
+        meta = _text(df["Category"])
+    cards = (
+        f"<div class='card' style='width:{width}px; flex-shrink: 0;'>"
+        '<img src="' + _text(df["ImageURL"]) + f'" width="{width}" class="product-image" />'
+        '<div class="product-name" style="font-size: 14px;">' + name + '</div>'
+        '<div class="small-muted">' + meta + '</div>'
+    )
+    if show_rating:
+        cards = cards + '<div class="rating">' + _stars(df["Rating"]) + '</div>'
+    return ("<div style='display:flex; gap:10px; overflow-x: auto;'>"
+            + _join(cards + "</div>") + "</div>")
+
+
+def recommendation_cards(df, theme, favourite, avg_price, similar=None):
+    """
+    Recommendation cards with predicted price and reason, each optionally followed by a
+    strip of similar products. `similar` maps StockCode -> DataFrame of similar rows.
+    """
+    if df.empty:
+        return ""
+    df = df.reset_index(drop=True)
+    cards = (
+        "<div class='card fade-in' style='display:flex; gap:14px; align-items:center; margin-bottom: 20px;'>"
+        '<img src="' + _text(df["ImageURL"]) + '" width="140" class="product-image" />'
+        '<div style="flex:1;">'
+        "<div class='product-name'>" + _text(df["Description"]) + "</div>"
+        "<div class='small-muted'>" + _text(df["Category"]) + " • ID: " + _text(df["StockCode"]) + "</div>"
+        '<div style="margin-top:8px;">'
+        "<span class='price'>₹" + _num(df["Price"]) + "</span>"
+        '&nbsp;&nbsp;<span class="rating">' + _stars(df["Rating"]) + "</span>"
+        "&nbsp;&nbsp;<span class='small-muted'>(" + _num(df["Rating"]) + "/5)</span>"
+        "</div>"
+        '<div style="margin-top:8px;">'
+        f'<strong style="color: {theme["primary"]};">Predicted Price:</strong> '
+        "<span class='price'>₹" + _num(df["PredictedPrice"]) + "</span>"
+        "</div>"
+        '<div style="margin-top:8px;">'
+        f'<strong style="color: {theme["secondary"]};">Why Recommended:</strong>'
+        f'<p style="color: {theme["text"]}; margin: 5px 0; font-size: 14px;">'
+        f"Based on your preference for {favourite} and price range around ₹{int(avg_price)}, this "
+        + _text(df["Category"].astype(str).str.lower()) + " item matches your shopping profile with a "
+        + _num(df["Rating"]) + "/5 rating.</p>"
+        "</div></div></div>"
+    )
+    if similar:
+        header = (f"<div class='fade-in' style='margin-top: 15px;'>"
+                  f"<h5 style='color: {theme['primary']};'>🔗 Similar Products</h5></div>")
+        strips = pd.Series([mini_cards(similar[c], width=150, truncate=0, meta="price_rating")
+                            if c in similar else "" for c in df["StockCode"]])
+        cards = cards + np.where(strips != "", header + strips, "")
+    return _join(cards)
+
+
+def page_bounds(total, page, page_size):
+    """Clamped (page, n_pages, start, stop) for a 1-based page over `total` rows."""
+    n_pages = max(1, -(-total // page_size))
+    page = min(max(1, int(page)), n_pages)
+    start = (page - 1) * page_size
+    return page, n_pages, start, min(start + page_size, total)
@@ -2,8 +2,9 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import requests
 import os
+import sys
+import time
 from pathlib import Path
 
 # -------------------------
@@ -13,6 +14,29 @@ st.set_page_config(page_title="ShopSense — Premium Recommender", page_icon="
 BASE_DIR = Path(__file__).resolve().parents[1]      # project root (ShopSense_Full_Project)
 DATA_DIR = BASE_DIR / "data" / "processed"
 PRODUCTS_FILE = DATA_DIR / "products.csv"
+RAW_PRODUCTS_FILE = BASE_DIR / "data" / "raw" / "products.csv"
+INTERACTIONS_FILE = BASE_DIR / "data" / "raw" / "interactions.csv"
+STORE_FILE = DATA_DIR / "shopsense.db"
+MODEL_FILE = BASE_DIR / "models" / "recommender.pkl"
+PRICE_MODEL_FILE = BASE_DIR / "models" / "price_model.npz"
+ID_MAP_DIR = DATA_DIR / "id_maps"
+AGG_DIR = DATA_DIR / "aggregates"
+PROFILES_FILE = AGG_DIR / "user_profiles.npz"
+COOC_FILE = AGG_DIR / "cooccurrence.npz"
+MAX_SESSION_VIEWS = 10
+
+# Shared ETL/recommender modules are imported from the project root
+sys.path.insert(0, str(BASE_DIR))
+from etl.store import catalog_frame, open_store
+from etl.aggregates import load_aggregates
+from etl.id_maps import load_id_maps
+from etl.user_profiles import PRICE_BINS, PRICE_LABELS, load_user_profiles
+from recommender.catalog import CatalogIndex, ensure_product_columns, merged_catalog, safe_read_products
+from recommender.engine import load_recommender
+from recommender.price_model import load_price_model
+from recommender.session import SessionRecommender
+from app import render
+from app.api_client import ApiClient, ApiError
 
 API_URL = os.getenv("API_URL", "DUMMY")
 
@@ -20,76 +44,133 @@ API_URL = os.getenv("API_URL", "DUMMY")
 # -------------------------
 # Helper utilities
 # -------------------------
-def safe_read_products(path):
-    if not path.exists():
-        # create a tiny fallback DataFrame if missing
-        df = pd.DataFrame([
-            ("P100027","Formal Shirt","Clothing",299.0,4.3,"https://via.placeholder.com/240x240.png?text=P100027"),
-            ("P100339","Travel Bottle","Home",149.0,4.0,"https://via.placeholder.com/240x240.png?text=P100339"),
-            ("P100118","Smartphone Case","Electronics",399.0,4.2,"https://via.placeholder.com/240x240.png?text=P100118"),
-            ("P100195","Backpack","Accessories",999.0,4.5,"https://via.placeholder.com/240x240.png?text=P100195"),
-            ("P100212","Digital Alarm Clock","Electronics",499.0,3.9,"https://via.placeholder.com/240x240.png?text=P100212"),
-        ], columns=["StockCode","Description","Category","Price","Rating","ImageURL"])
-        return df
-    df = pd.read_csv(path)
-    # normalize columns
-    if "StockCode" not in df.columns:
-        # try fallback names
-        if "product_id" in df.columns: df = df.rename(columns={"product_id":"StockCode"})
-        elif "Stockcode" in df.columns: df = df.rename(columns={"Stockcode":"StockCode"})
-    # ensure required columns
-    if "Description" not in df.columns: df["Description"] = df["StockCode"].apply(lambda x: f"Product {x}")
-    if "Category" not in df.columns: df["Category"] = "General"
-    if "Price" not in df.columns:
-        # create synthetic prices
-        np.random.seed(42)
-        df["Price"] = np.round(np.random.uniform(100, 2500, size=len(df)), 2)
-    if "Rating" not in df.columns:
-        np.random.seed(1)
-        df["Rating"] = np.round(np.random.uniform(3.5, 5.0, size=len(df)), 1)
-    if "ImageURL" not in df.columns:
-        # placeholder images
-        df["ImageURL"] = df["StockCode"].apply(lambda x: f"https://via.placeholder.com/240x240.png?text={x}")
-    return df
-
-def price_predictor(price):
+def lookup_products(codes):
+    """Catalog rows for the given codes: indexed store lookups when the store exists, else the loaded catalog."""
+    if store is not None:
+        rows = pd.DataFrame(store.products(codes))
+        if not rows.empty:
+            rows = ensure_product_columns(rows.drop(columns=["item_idx"]))
+            return rows.fillna({"Price": 0.0, "Rating": 0.0})
+    return catalog.rows(codes).copy()
+
+def price_predictor(rows):
     """
-    Returns a simple 'predicted price' (demonstration).
-    This could be replaced by an ML model artifact (saved model) later.
+    Predicted prices for a frame of products, scored in one batch by the trained price model.
+    Products the model has not seen are scored from their Category and Rating; without a
+    trained model the listed price is shown.
     """
-    # Add small random markup / discount for demo
-    noise = np.random.normal(loc=1.02, scale=0.05)
-    return round(price * noise, 2)
+    price_model, items = cached_price_model(str(PRICE_MODEL_FILE), file_version(PRICE_MODEL_FILE))
+    if price_model is None:
+        return rows["Price"].round(2).to_numpy()
+    predicted = price_model.predict_items(items.encode(rows["StockCode"]))
+    unseen = np.isnan(predicted)
+    if unseen.any():
+        predicted[unseen] = price_model.predict(rows["Category"].to_numpy()[unseen], rows["Rating"].to_numpy()[unseen])
+    return predicted
+
+@st.cache_resource(show_spinner=False)
+def api_client(api_url):
+    # One pooled client per process, shared by every session
+    return ApiClient(api_url)
 
 def fetch_recommendations(user_id, top_n):
-    # ✅ CLOUD MODE: use fallback recommender if FastAPI is not reachable
+    """
+    Recommendation codes, {code: similar-product records}, the user's purchase history
+    (None when unavailable) and per-call timings in ms. Raises ApiError if the API fails
+    and LookupError if the embedded model does not know the user.
+    """
+    # ✅ EMBEDDED MODE: score in-process with the API's engine, no network hop
     if API_URL == "DUMMY":
-        return list(products_df["StockCode"].sample(top_n))
-
-    try:
-        resp = requests.get(f"{API_URL}/{user_id}?top_n={top_n}", timeout=5)
-        resp.raise_for_status()
-        return resp.json().get("recommendations", [])
-    except:
-        return list(products_df["StockCode"].sample(top_n))
-
-def similar_products(df, code, top_k=4):
-    """Return similar products by same category (fallback)."""
-    row = df[df["StockCode"] == code]
-    if row.empty:
-        return []
-    category = row["Category"].values[0]
-    same_cat = df[df["Category"] == category]
-    same_cat = same_cat[same_cat["StockCode"] != code]
-    # sort by Rating and Price closeness
-    same_cat["score"] = (same_cat["Rating"].rank(ascending=False) * 2) - (abs(same_cat["Price"] - row["Price"].values[0]) / (row["Price"].values[0] + 1))
-    same_cat = same_cat.sort_values("score", ascending=False)
-    return same_cat.head(top_k).to_dict("records")
+        start = time.perf_counter()
+        engine = cached_engine(str(MODEL_FILE), file_version(MODEL_FILE))
+        source = "sample"
+        if engine is None:
+            # No trained model on this box: demo with a random sample
+            recs = list(products_df["StockCode"].sample(top_n))
+        else:
+            # Unknown users get the engine's cold-start answer when the ETL aggregates exist
+            scored = engine.recommend_scored(user_id, top_n, st.session_state.get("viewed", []))
+            if scored is None:
+                raise LookupError(f"User {user_id} is not in the trained model.")
+            recs, source = engine.item_ids.decode(scored[0]).tolist(), scored[2]
+        scored_ms = (time.perf_counter() - start) * 1000
+        similar = {code: catalog.similar(code, top_k=4) for code in recs}
+        return recs, similar, None, {f"engine ({source})" if engine else source: scored_ms,
+                                     "similar": (time.perf_counter() - start) * 1000 - scored_ms}
+
+    client = api_client(API_URL)
+    # Recommendations and history are independent; the similar-item calls fan out once the codes are known
+    first = client.gather({"recommend": (client.recommend, user_id, top_n), "history": (client.history, user_id)})
+    if first["recommend"].error:
+        raise first["recommend"].error
+    recs = first["recommend"].value
+    second = client.gather({code: (client.similar, code, 4) for code in recs})
+    similar = {code: r.value for code, r in second.items() if r.value}
+    timings = {"recommend": first["recommend"].ms, "history": first["history"].ms,
+               f"similar x{len(second)}": max((r.ms for r in second.values()), default=0.0)}
+    return recs, similar, first["history"].value, timings
 
 # -------------------------
-# Load Data
+# Load Data (cached across reruns and sessions, invalidated when the product or id map files change)
 # -------------------------
-products_df = safe_read_products(PRODUCTS_FILE)
+def file_version(path):
+    return path.stat().st_mtime_ns if path.exists() else None
+
+cache_misses = set()  # cached function bodies only run on a miss, so they record themselves here
+cache_stats = {}
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def cached_catalog(path, version):
+    # `version` is only part of the cache key: a new mtime builds a fresh index
+    cache_misses.add("catalog")
+    users, items = load_id_maps(ID_MAP_DIR)
+    if len(items):
+        # The store's products table, so the gallery, search and similar products quote the
+        # same price and rating as store lookups
+        return merged_catalog(catalog_frame(users, items, [str(RAW_PRODUCTS_FILE), path], str(INTERACTIONS_FILE)), version)
+    return CatalogIndex(safe_read_products(Path(path)), version)
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def cached_filter(_catalog, version, query, category):
+    cache_misses.add("filter")
+    return _catalog.filter(query, category)
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def cached_store(path, version):
+    return open_store(Path(path))
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def cached_profiles(path, version):
+    # Profile arrays plus the user id map that indexes them; (None, None) before the ETL has run
+    profiles = load_user_profiles(str(Path(path).parent))
+    return (profiles, load_id_maps(ID_MAP_DIR)[0]) if profiles is not None else (None, None)
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def cached_session_recommender(path, version):
+    aggregates = load_aggregates(str(AGG_DIR))
+    return SessionRecommender(aggregates, load_id_maps(ID_MAP_DIR)[1]) if aggregates is not None else None
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def cached_price_model(path, version):
+    price_model = load_price_model(path)
+    return (price_model, load_id_maps(ID_MAP_DIR)[1]) if price_model is not None else (None, None)
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def cached_engine(path, version):
+    # Loaded once per model file version and shared by every session
+    return load_recommender(path, ID_MAP_DIR, aggregates=load_aggregates(str(AGG_DIR)))
+
+def timed_cache_call(name, fn, *args):
+    """Call a cached function, recording its latency and whether it was a cache hit."""
+    start = time.perf_counter()
+    result = fn(*args)
+    cache_stats[name] = ((time.perf_counter() - start) * 1000, name not in cache_misses)
+    return result
+
+catalog_version = tuple(file_version(p) for p in (PRODUCTS_FILE, RAW_PRODUCTS_FILE, INTERACTIONS_FILE, ID_MAP_DIR / "items.csv"))
+catalog = timed_cache_call("catalog", cached_catalog, str(PRODUCTS_FILE), catalog_version)
+products_df = catalog.df
+store = cached_store(str(STORE_FILE), file_version(STORE_FILE))
 
 # -------------------------
 # UI: style & theme toggle
@@ -610,7 +691,7 @@ st.markdown("""
 left, right = st.columns([3,1])
 with left:
     query = st.text_input("Search products (name or id)", "", key="search", help="Type product name or ID to search")
-    categories = ["All"] + sorted(products_df["Category"].unique().tolist())
+    categories = catalog.categories
     chosen_cat = st.selectbox("Filter category", categories, help="Select a category to filter products")
 with right:
     st.write("")  # spacing
@@ -622,12 +703,11 @@ st.markdown("</div></div>", unsafe_allow_html=True)
 # -------------------------
 # Data Filtering for product listing
 # -------------------------
-filtered = products_df.copy()
-if query:
-    q = str(query).lower()
-    filtered = filtered[filtered["Description"].str.lower().str.contains(q) | filtered["StockCode"].str.lower().str.contains(q)]
-if chosen_cat != "All":
-    filtered = filtered[filtered["Category"] == chosen_cat]
+filtered = timed_cache_call("filter", cached_filter, catalog, catalog_version, query, chosen_cat)
+
+with st.sidebar.expander("⚡ Cache timings"):
+    for name, (ms, hit) in cache_stats.items():
+        st.caption(f"{name}: {'hit' if hit else 'miss'} in {ms:.2f} ms")
 
 # -------------------------
 # Product Gallery Section
@@ -635,32 +715,22 @@ if chosen_cat != "All":
 st.markdown("""
 <div class="section fade-in">
     <h3>🛒 Product Gallery</h3>
-    <div class="grid">
 """, unsafe_allow_html=True)
 
-def render_product_card(p):
-    return f"""
-    <div class="card">
-      <div class="flex">
-        <img src="{p['ImageURL']}" width="120" class="product-image" />
-        <div style="flex: 1;">
-          <div class="product-name">{p['Description']}</div>
-          <div class="small-muted">{p['Category']} • ID: {p['StockCode']}</div>
-          <div style="margin-top:8px;">
-            <span class="price">₹{p['Price']}</span>
-            &nbsp;&nbsp;<span class="rating">{'★'*int(round(p['Rating']))}</span>
-            &nbsp;&nbsp;<span class="small-muted">({p['Rating']}/5)</span>
-          </div>
-        </div>
-      </div>
-    </div>
-    """
+@st.fragment
+def product_gallery(filtered):
+    """One page of the filtered catalog; paging reruns only this fragment, not the whole page."""
+    nav1, nav2 = st.columns([3, 1])
+    page_size = nav2.selectbox("Per page", [9, 18, 36, 72], key="gallery_page_size")
+    page, n_pages, start, stop = render.page_bounds(len(filtered), st.session_state.get("gallery_page", 1), page_size)
+    st.session_state["gallery_page"] = page  # clamp after the filter shrinks the result set
+    nav1.number_input(f"Page (of {n_pages})", min_value=1, max_value=n_pages, step=1, key="gallery_page")
+    st.caption(f"Showing {start + 1 if stop else 0}-{stop} of {len(filtered)} products")
+    st.markdown(f'<div class="grid">{render.product_cards(filtered.iloc[start:stop])}</div>', unsafe_allow_html=True)
 
-rows = filtered.to_dict("records")
-for r in rows[:9]:
-    st.markdown(render_product_card(r), unsafe_allow_html=True)
+product_gallery(filtered)
 
-st.markdown("</div></div>", unsafe_allow_html=True)
+st.markdown("</div>", unsafe_allow_html=True)
 
 st.markdown("---")
 
@@ -673,28 +743,59 @@ st.markdown("""
     <p style="text-align: center; margin-bottom: 20px;">Discover your shopping preferences through data visualization</p>
 """, unsafe_allow_html=True)
 
-# Mock user data for demonstration
-sample_size = min(20, len(products_df))
-user_purchases = products_df.sample(sample_size, random_state=user_id).copy()
-user_categories = user_purchases['Category'].value_counts()
-user_price_range = pd.cut(user_purchases['Price'], bins=[0, 500, 1000, 2000, 5000], labels=['Under ₹500', '₹500-₹1000', '₹1000-₹2000', 'Over ₹2000'])
+profiles, profile_user_ids = cached_profiles(str(PROFILES_FILE), file_version(PROFILES_FILE))
+profile = profiles.get(profile_user_ids.get(user_id)) if profiles is not None else None
+if profile is not None:
+    # Precomputed by the ETL: a few array reads per user
+    n_purchases = profile["purchases"]
+    avg_price = profile["avg_price"] or 0
+    aov = profile["aov"]
+    avg_rating = np.nan if profile["avg_rating"] is None else profile["avg_rating"]
+    user_categories = pd.Series(profile["top_categories"], dtype="int64")
+    price_data = pd.Series(profile["price_bands"])
+else:
+    if store is not None:
+        # Real purchase history and ratings via indexed per-user lookups
+        user_purchases = pd.DataFrame(store.user_history(user_id), columns=["InvoiceNo", "Quantity", "StockCode", "Description", "Category", "Price"])
+        avg_rating = pd.DataFrame(store.user_ratings(user_id), columns=["StockCode", "rating"])["rating"].mean()
+        # Same definition as the ETL profiles: spend on priced lines over all of the user's orders
+        priced = user_purchases.dropna(subset=["Price"])
+        aov = (priced["Price"] * priced["Quantity"]).sum() / user_purchases["InvoiceNo"].nunique() if len(priced) else None
+    else:
+        # Mock user data for demonstration
+        sample_size = min(20, len(products_df))
+        user_purchases = products_df.sample(sample_size, random_state=user_id).copy()
+        avg_rating = user_purchases['Rating'].mean()
+        aov = None  # sampled products have no orders
+    n_purchases = len(user_purchases)
+    avg_price = 0 if user_purchases.empty else user_purchases['Price'].mean()
+    user_categories = user_purchases['Category'].value_counts()
+    price_data = pd.cut(user_purchases['Price'], bins=PRICE_BINS, labels=PRICE_LABELS).value_counts()
 
 col1, col2 = st.columns(2)
 with col1:
     st.markdown(f"""
     <div class="stats-card bounce-in">
-        <h4>{len(user_purchases)}</h4>
+        <h4>{n_purchases}</h4>
         <p>Total Purchases</p>
     </div>
     """, unsafe_allow_html=True)
     
     st.markdown(f"""
     <div class="stats-card bounce-in" style="animation-delay: 0.2s;">
-        <h4>₹{user_purchases['Price'].mean():.0f}</h4>
-        <p>Average Order Value</p>
+        <h4>₹{avg_price:.0f}</h4>
+        <p>Average Item Price</p>
     </div>
     """, unsafe_allow_html=True)
 
+    if aov is not None:
+        st.markdown(f"""
+        <div class="stats-card bounce-in" style="animation-delay: 0.3s;">
+            <h4>₹{aov:.0f}</h4>
+            <p>Average Order Value</p>
+        </div>
+        """, unsafe_allow_html=True)
+
 with col2:
     st.markdown(f"""
     <div class="stats-card bounce-in" style="animation-delay: 0.4s;">
@@ -705,7 +806,7 @@ with col2:
     
     st.markdown(f"""
     <div class="stats-card bounce-in" style="animation-delay: 0.6s;">
-        <h4>{user_purchases['Rating'].mean():.1f}⭐</h4>
+        <h4>{'N/A' if pd.isna(avg_rating) else f'{avg_rating:.1f}⭐'}</h4>
         <p>Average Rating Given</p>
     </div>
     """, unsafe_allow_html=True)
@@ -722,7 +823,6 @@ with chart_col1:
 
 with chart_col2:
     # Price range preferences
-    price_data = user_price_range.value_counts()
     st.markdown(f"<div style='background: {T['card_bg']}; padding: 20px; border-radius: 15px; backdrop-filter: blur(10px);'><h5 style='color: {T['primary']}; margin-bottom: 15px;'>💰 Price Range Preferences</h5></div>", unsafe_allow_html=True)
     st.bar_chart(price_data)
 
@@ -739,38 +839,39 @@ st.markdown("""
     <p style="text-align: center; margin-bottom: 20px;">Recommendations based on your current browsing session</p>
 """, unsafe_allow_html=True)
 
-# Simulate session data
-session_views = products_df.sample(5, random_state=42).copy()
-session_recs = products_df.sample(6, random_state=43).copy()
+def view_product():
+    """Record the product opened in the selector as the latest view of this session."""
+    code = st.session_state["view_product"]
+    if code:
+        viewed = [c for c in st.session_state.get("viewed", []) if c != code] + [code]
+        st.session_state["viewed"] = viewed[-MAX_SESSION_VIEWS:]
 
-st.markdown(f"<div class='fade-in' style='margin-bottom: 15px;'><h5 style='color: {T['primary']};'>👀 Recently Viewed</h5></div>", unsafe_allow_html=True)
+browse = filtered.head(200)
+names = dict(zip(browse["StockCode"].astype(str), browse["Description"].astype(str)))
+st.selectbox("Open a product", [""] + list(names), key="view_product", on_change=view_product,
+             format_func=lambda c: f"{names[c]} ({c})" if c else "Choose a product to view...")
 
-session_html = "<div style='display:flex; gap:10px; margin-bottom:20px; overflow-x: auto;'>"
-for _, row in session_views.iterrows():
-    session_html += f"""
-    <div class='card' style='width:180px; flex-shrink: 0;'>
-        <img src="{row['ImageURL']}" width="180" class="product-image" />
-        <div class="product-name" style="font-size: 14px;">{row['Description'][:30]}...</div>
-        <div class="small-muted">{row['Category']}</div>
-    </div>
-    """
-session_html += "</div>"
-st.components.v1.html(session_html, height=200)
+viewed = st.session_state.get("viewed", [])
+st.markdown(f"<div class='fade-in' style='margin-bottom: 15px;'><h5 style='color: {T['primary']};'>👀 Recently Viewed</h5></div>", unsafe_allow_html=True)
+if viewed:
+    st.components.v1.html(render.mini_cards(lookup_products(viewed[::-1])), height=200)
+else:
+    st.caption("Open a product above to start a session.")
 
 st.markdown(f"<div class='fade-in' style='margin-bottom: 15px;'><h5 style='color: {T['primary']};'>💡 Because You Viewed These</h5></div>", unsafe_allow_html=True)
-
-session_rec_html = "<div style='display:flex; gap:10px; overflow-x: auto;'>"
-for _, row in session_recs.iterrows():
-    session_rec_html += f"""
-    <div class='card' style='width:180px; flex-shrink: 0;'>
-        <img src="{row['ImageURL']}" width="180" class="product-image" />
-        <div class="product-name" style="font-size: 14px;">{row['Description'][:30]}...</div>
-        <div class="small-muted">{row['Category']} • ₹{row['Price']}</div>
-        <div class="rating">{'★'*int(round(row['Rating']))}</div>
-    </div>
-    """
-session_rec_html += "</div>"
-st.components.v1.html(session_rec_html, height=200)
+session_recommender = cached_session_recommender(str(COOC_FILE), file_version(COOC_FILE))
+start = time.perf_counter()
+if session_recommender is not None:
+    # Invoice co-occurrence of the viewed items (popular items when nothing is viewed yet)
+    session_codes = session_recommender.recommend(viewed, 6)
+else:
+    # No ETL aggregates on this box: nearest catalog neighbours of the latest views
+    session_codes = list(dict.fromkeys(r["StockCode"] for code in viewed[::-1] for r in catalog.similar(code, top_k=6)))[:6]
+session_ms = (time.perf_counter() - start) * 1000
+session_recs = lookup_products(session_codes)
+if not session_recs.empty:
+    st.components.v1.html(render.mini_cards(session_recs, meta="category_price", show_rating=True), height=200)
+    st.caption(f"Updated in {session_ms:.1f} ms from {len(viewed)} viewed item(s)")
 
 st.markdown("</div>", unsafe_allow_html=True)
 
@@ -791,61 +892,33 @@ if st.button("🔮 Generate Recommendations"):
             <strong style="color: """ + T['primary'] + """;">🔍 Analyzing your preferences and generating personalized recommendations...</strong>
         </div>
         """, unsafe_allow_html=True)
-        import time
-        time.sleep(1)  # Simulate processing time
-        recs = fetch_recommendations(user_id, top_n)
+        start, error = time.perf_counter(), None
+        try:
+            recs, similar, history, timings = fetch_recommendations(user_id, top_n)
+        except (ApiError, LookupError) as e:
+            recs, error = [], e
+        elapsed_ms = (time.perf_counter() - start) * 1000
     if not recs:
-        st.warning("No recommendations returned by API.")
+        st.warning(f"No recommendations returned by API: {error}" if error else "No recommendations returned by API.")
     else:
         # Map rec codes to product rows
-        rec_rows = products_df[products_df["StockCode"].isin(recs)].copy()
+        rec_rows = lookup_products(recs)
         # Add predicted price column
-        rec_rows["PredictedPrice"] = rec_rows["Price"].apply(price_predictor)
+        rec_rows["PredictedPrice"] = price_predictor(rec_rows)
         rec_rows = rec_rows.sort_values("Rating", ascending=False)
 
         st.markdown(f"<div class='fade-in' style='margin-bottom: 20px;'><h3>🎉 Top {len(rec_rows)} Recommendations for User {user_id}</h3></div>", unsafe_allow_html=True)
-        # show recommendations as grid
-        for idx, row in rec_rows.iterrows():
-            card_html = f"""
-            <div class='card fade-in' style='display:flex; gap:14px; align-items:center; margin-bottom: 20px;'>
-                <img src="{row['ImageURL']}" width="140" class="product-image" />
-                <div style="flex:1;">
-                    <div class='product-name'>{row['Description']}</div>
-                    <div class='small-muted'>{row['Category']} • ID: {row['StockCode']}</div>
-                    <div style="margin-top:8px;">
-                        <span class='price'>₹{row['Price']}</span>
-                        &nbsp;&nbsp;<span class="rating">{'★'*int(round(row['Rating']))}</span>
-                        &nbsp;&nbsp;<span class='small-muted'>({row['Rating']}/5)</span>
-                    </div>
-                    <div style="margin-top:8px;">
-                        <strong style="color: {T['primary']};">Predicted Price:</strong> <span class='price'>₹{row['PredictedPrice']}</span>
-                    </div>
-                    <div style="margin-top:8px;">
-                        <strong style="color: {T['secondary']};">Why Recommended:</strong>
-                        <p style="color: {T['text']}; margin: 5px 0; font-size: 14px;">
-                            Based on your preference for {user_categories.index[0] if len(user_categories) > 0 else 'similar products'} and price range around ₹{int(user_purchases['Price'].mean())}, this {row['Category'].lower()} item matches your shopping profile with a {row['Rating']}/5 rating.
-                        </p>
-                    </div>
-                </div>
-            </div>
-            """
-            st.markdown(card_html, unsafe_allow_html=True)
-
-            # Similar products rows
-            sim_prods = similar_products(products_df, row["StockCode"], top_k=4)
-            if sim_prods:
-                st.markdown(f"<div class='fade-in' style='margin-top: 15px;'><h5 style='color: {T['primary']};'>🔗 Similar Products</h5></div>", unsafe_allow_html=True)
-                sim_html = "<div style='display:flex; gap:8px; margin-top:8px; overflow-x: auto;'>"
-                for sp in sim_prods:
-                    sim_html += f"""
-                    <div class='card fade-in' style='width:150px; flex-shrink: 0;'>
-                        <img src="{sp['ImageURL']}" width="150" class="product-image" />
-                        <div class="product-name" style="font-size: 14px;">{sp['Description']}</div>
-                        <div class="small-muted">₹{sp['Price']} • {sp['Rating']}/5</div>
-                    </div>
-                    """
-                sim_html += "</div>"
-                st.components.v1.html(sim_html, height=180)
+        st.caption(f"Fetched in {elapsed_ms:.0f} ms (" + ", ".join(f"{k}: {v:.0f} ms" for k, v in timings.items()) + ")")
+        favourite = user_categories.index[0] if len(user_categories) > 0 else "similar products"
+        reason_price = avg_price
+        if history:
+            # The API's view of the user wins when the app has no local store
+            history = pd.DataFrame(history)
+            favourite = history["Category"].mode().iloc[0]
+            reason_price = history["Price"].mean() if history["Price"].notna().any() else avg_price
+        # All cards and their similar-product strips go out as one markdown block
+        similar = {code: pd.DataFrame(sim) for code, sim in similar.items() if sim}
+        st.markdown(render.recommendation_cards(rec_rows, T, favourite, reason_price, similar), unsafe_allow_html=True)
 
         st.markdown(f"""
         <div class="fade-in" style="text-align: center; padding: 20px; background: {T['card_bg']}; border-radius: 15px; backdrop-filter: blur(10px); margin-top: 20px;">
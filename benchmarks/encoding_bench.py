@@ -0,0 +1,74 @@
+"""
+Encoding cost and size of /recommend responses: JSON (the current response) vs packed vs msgpack.
+
+JSON is timed the way FastAPI produces it for a returned dict: decode the item indices to
+StockCodes, run jsonable_encoder, then render a JSONResponse. The binary formats go
+through api.encoding. msgpack is skipped when the optional package is not installed.
+
+    python -m benchmarks.encoding_bench --items 10,100 --batch 100
+"""
+import argparse, json, sys, timeit
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from api import encoding
+from etl.id_maps import IdMap
+
+
+def encoders(item_ids):
+    def as_json(users, items, scores):
+        if len(users) == 1:
+            payload = {'user': users[0], 'top_n': len(items[0]), 'recommendations': item_ids.decode(items[0]).tolist()}
+        else:
+            payload = {'top_n': len(items[0]), 'results': [{'user': u, 'recommendations': item_ids.decode(i).tolist()}
+                                                          for u, i in zip(users, items)]}
+        return JSONResponse(jsonable_encoder(payload)).body
+
+    def as_packed(users, items, scores):
+        if len(users) == 1:
+            return encoding.pack_recommendations(items[0], scores[0])
+        offsets = np.concatenate([[0], np.cumsum([len(i) for i in items])])
+        return encoding.pack_batch(offsets, np.concatenate(items), np.concatenate(scores))
+
+    def as_msgpack(users, items, scores):
+        results = [{'user': u, 'recommendations': item_ids.decode(i).tolist(), 'scores': s.tolist()}
+                   for u, i, s in zip(users, items, scores)]
+        return encoding.pack_msgpack(results[0] if len(users) == 1 else {'top_n': len(items[0]), 'results': results})
+
+    found = {'json': as_json, 'packed': as_packed}
+    if encoding.msgpack is not None:
+        found['msgpack'] = as_msgpack
+    return found
+
+
+def run(item_counts, batch, n_items=100000, seed=0):
+    rng = np.random.default_rng(seed)
+    item_ids = IdMap(np.char.add('P', (100000 + np.arange(n_items)).astype(str)))
+    results = []
+    for n in item_counts:
+        for users in (1, batch):
+            items = [rng.integers(0, n_items, n).astype(np.int32) for _ in range(users)]
+            scores = [np.sort(rng.random(n, dtype=np.float32))[::-1] for _ in range(users)]
+            user_ids = list(range(10000, 10000 + users))
+            for name, fn in encoders(item_ids).items():
+                timer = timeit.Timer(lambda: fn(user_ids, items, scores))
+                number, _ = timer.autorange()
+                seconds = min(timer.repeat(5, number)) / number
+                results.append({'encoding': name, 'items': n, 'users': users, 'bytes': len(fn(user_ids, items, scores)),
+                                'us_per_response': seconds * 1e6})
+                print(f'{name:8s} items={n:<5d} users={users:<5d} {results[-1]["bytes"]:>9d} B '
+                      f'{results[-1]["us_per_response"]:>10.1f} us', file=sys.stderr)
+    return results
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    p.add_argument('--items', default='10,100', help='comma separated items per user')
+    p.add_argument('--batch', type=int, default=100, help='users per batch response')
+    a = p.parse_args(argv)
+    print(json.dumps(run([int(n) for n in a.items.split(',')], a.batch), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""
+Load test for the FastAPI service: throughput and latency percentiles under concurrency.
+
+Starts `api.app:app` with uvicorn on a free local port, serving the project at --root
+(SHOPSENSE_HOME). It then drives a weighted mix of endpoints from --concurrency async
+httpx clients for --duration seconds and prints one JSON document. The document records
+the git commit, so runs can be compared across commits.
+
+    python -m benchmarks.load_test --mix recommend=70,products=10,categories=10,status=10 --concurrency 32
+"""
+import argparse, asyncio, json, os, random, socket, subprocess, sys, time
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENDPOINTS = {
+    'recommend': lambda rng, users: f'/recommend/{rng.choice(users)}?n=10',
+    'products': lambda rng, users: '/products',
+    'categories': lambda rng, users: '/categories',
+    'status': lambda rng, users: '/api/status',
+}
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name not in ENDPOINTS:
+            raise SystemExit(f'unknown endpoint {name!r}; choose from {", ".join(ENDPOINTS)}')
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _user_ids(root, limit=10000):
+    path = os.path.join(root, 'data', 'processed', 'id_maps', 'users.csv')
+    if os.path.exists(path):
+        return pd.read_csv(path, nrows=limit, dtype=str)['code'].tolist()
+    return [str(u) for u in range(10000, 11000)]
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT,
+                              capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def start_server(root, port, workers=1, timeout=60):
+    env = dict(os.environ, SHOPSENSE_HOME=root, PYTHONPATH=PROJECT_ROOT + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    cmd = [sys.executable, '-m', 'uvicorn', 'api.app:app', '--host', '127.0.0.1', '--port', str(port),
+           '--workers', str(workers), '--log-level', 'warning']
+    proc = subprocess.Popen(cmd, cwd=PROJECT_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f'uvicorn exited: {proc.stderr.read().strip()[-500:]}')
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError(f'uvicorn did not start within {timeout}s')
+
+
+async def _worker(client, mix, users, deadline, rng, samples):
+    names, weights = list(mix), list(mix.values())
+    while time.perf_counter() < deadline:
+        name = rng.choices(names, weights)[0]
+        start = time.perf_counter()
+        try:
+            resp = await client.get(ENDPOINTS[name](rng, users))
+            ok = resp.status_code == 200
+        except Exception:
+            ok = False
+        samples[name].append(((time.perf_counter() - start) * 1000, ok))
+
+
+async def drive(base_url, mix, users, concurrency, duration, warmup, seed=0):
+    import httpx
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        if warmup:
+            await asyncio.gather(*(_worker(client, mix, users, time.perf_counter() + warmup, random.Random(seed + i),
+                                           {n: [] for n in mix}) for i in range(concurrency)))
+        samples = {n: [] for n in mix}
+        start = time.perf_counter()
+        await asyncio.gather(*(_worker(client, mix, users, start + duration, random.Random(seed + i), samples)
+                               for i in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return samples, elapsed
+
+
+def summarize(samples, elapsed):
+    def stats(rows):
+        ms = np.array([r[0] for r in rows]) if rows else np.zeros(0)
+        errors = sum(not r[1] for r in rows)
+        if not len(ms):
+            return {'requests': 0, 'errors': 0}
+        p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+        return {'requests': len(ms), 'errors': errors, 'rps': len(ms) / elapsed, 'mean_ms': float(ms.mean()),
+                'p50_ms': float(p50), 'p95_ms': float(p95), 'p99_ms': float(p99), 'max_ms': float(ms.max())}
+    endpoints = {name: stats(rows) for name, rows in samples.items()}
+    return {'overall': stats([r for rows in samples.values() for r in rows]), 'endpoints': endpoints}
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    p.add_argument('--root', default=PROJECT_ROOT, help='project root whose data/models the API serves')
+    p.add_argument('--mix', default='recommend=70,products=10,categories=10,status=10',
+                   help=f'comma separated endpoint=weight pairs ({", ".join(ENDPOINTS)})')
+    p.add_argument('--concurrency', type=int, default=16)
+    p.add_argument('--duration', type=float, default=10, help='measured seconds')
+    p.add_argument('--warmup', type=float, default=2, help='unmeasured seconds before the run')
+    p.add_argument('--workers', type=int, default=1, help='uvicorn worker processes')
+    p.add_argument('--url', default=None, help='test an already running server instead of starting one')
+    p.add_argument('--out', default=None, help='write the JSON results here as well as stdout')
+    a = p.parse_args(argv)
+
+    mix = parse_mix(a.mix)
+    root = os.path.abspath(a.root)
+    proc = None
+    if a.url:
+        base_url = a.url.rstrip('/')
+    else:
+        port = _free_port()
+        proc = start_server(root, port, a.workers)
+        base_url = f'http://127.0.0.1:{port}'
+    try:
+        samples, elapsed = asyncio.run(drive(base_url, mix, _user_ids(root), a.concurrency, a.duration, a.warmup))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+    result = {'commit': _git_commit(), 'url': base_url, 'mix': mix, 'concurrency': a.concurrency,
+              'workers': a.workers, 'duration_s': elapsed, **summarize(samples, elapsed)}
+    text = json.dumps(result, indent=2)
+    if a.out:
+        with open(a.out, 'w') as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""
+Microbenchmarks for the recommendation hot paths, with regression thresholds.
+
+Each case times one function on synthetic inputs at several sizes and reports the
+median seconds per call over a few repeats. --save writes the results as a baseline.
+--baseline compares against one and exits non-zero when a case is slower than
+baseline x --threshold, so performance fixes stay fixed.
+
+    python -m benchmarks.microbench --sizes small,medium --save benchmarks/microbench_baseline.json
+    python -m benchmarks.microbench --sizes small,medium --baseline benchmarks/microbench_baseline.json --threshold 1.5
+"""
+import argparse, json, os, sys, tempfile, timeit
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+
+from recommender.tracing import span, traced
+from etl.id_maps import IdMap
+from recommender.catalog import CatalogIndex, build_neighbor_table, safe_read_products
+from recommender.engine import Recommender
+from recommender.filters import ItemFilters
+from recommender.quantize import quantize_model
+from recommender.rerank import mmr, quota
+
+SIZES = {
+    'small': {'users': 1000, 'items': 500, 'per_user': 20},
+    'medium': {'users': 5000, 'items': 2000, 'per_user': 30},
+    'large': {'users': 10000, 'items': 10000, 'per_user': 40},
+}
+CATEGORIES = ['Accessories', 'Clothing', 'Electronics', 'Footwear', 'Home', 'Personal Care']
+
+
+def synthetic(size, seed=0):
+    """Rating matrix, fitted Recommender and product catalog for one size."""
+    from sklearn.metrics.pairwise import cosine_similarity
+    rng = np.random.default_rng(seed)
+    n_users, n_items, per_user = size['users'], size['items'], size['per_user']
+    rows = np.repeat(np.arange(n_users), per_user)
+    cols = rng.zipf(1.3, len(rows)) % n_items
+    mat = csr_matrix((rng.integers(1, 6, len(rows)).astype(np.float32), (rows, cols)), shape=(n_users, n_items))
+    users = IdMap(np.arange(10000, 10000 + n_users))
+    items = IdMap(np.char.add('P', (100000 + np.arange(n_items)).astype(str)))
+    engine = Recommender({'similarity': cosine_similarity(mat), 'matrix': mat}, users, items)
+    products = pd.DataFrame({
+        'StockCode': items.codes,
+        'Description': np.char.add('Product ', np.arange(n_items).astype(str)),
+        'Category': np.asarray(CATEGORIES)[rng.integers(0, len(CATEGORIES), n_items)],
+        'Price': np.round(rng.lognormal(np.log(400), 0.8, n_items), 2),
+        'Rating': np.round(rng.uniform(3.5, 5.0, n_items), 1),
+    })
+    return mat, engine, products
+
+
+def cases(size, workdir):
+    """(name, callable, calls per invocation) for one size; setup happens here, outside the timed calls."""
+    from sklearn.metrics.pairwise import cosine_similarity
+    mat, engine, products = synthetic(size)
+    rng = np.random.default_rng(1)
+    user_ids = rng.choice(engine.user_ids.codes, 256)
+    idx = engine.user_index(user_ids[0])
+    neighbors = engine.nearest_users(idx, 10)
+    path = Path(workdir) / f'products_{size["items"]}.csv'
+    products.to_csv(path, index=False)
+    catalog = CatalogIndex(products)
+    codes = rng.choice(products['StockCode'].to_numpy(), 256)
+    filters = ItemFilters.from_products(products, engine.item_ids)
+    allowed = filters.mask('Electronics', 200, 800)
+    candidates, scores = engine.score(idx, 30)
+    engine_int8 = Recommender(quantize_model(engine.model, 'int8'), engine.user_ids, engine.item_ids)
+    return [
+        ('user_lookup', lambda: [engine.user_index(u) for u in user_ids], len(user_ids)),
+        ('neighbor_selection', lambda: engine.nearest_users(idx, 10), 1),
+        ('neighbor_selection_int8', lambda: engine_int8.nearest_users(idx, 10), 1),
+        ('item_aggregation', lambda: engine.collect_items(neighbors, 10), 1),
+        ('recommend', lambda: engine.recommend(user_ids[0], 10), 1),
+        ('recommend_traced', lambda: _traced_recommend(engine, user_ids[0]), 1),
+        ('span_untraced', _spans, 100),
+        ('span_traced', _traced_spans, 100),
+        ('recommend_filtered', lambda: engine.score(idx, 10, allowed), 1),
+        ('rerank_mmr', lambda: mmr(candidates, scores, filters.item_category, 10), 1),
+        ('rerank_quota', lambda: quota(candidates, scores, filters.item_category, 10), 1),
+        ('cosine_similarity', lambda: cosine_similarity(mat), 1),
+        ('safe_read_products', lambda: safe_read_products(path), 1),
+        ('similar_products', lambda: [catalog.similar(c, 4) for c in codes], len(codes)),
+        ('build_neighbor_table', lambda: build_neighbor_table(catalog.df), 1),
+    ]
+
+
+def _spans(k=100):
+    for _ in range(k):
+        with span('stage'):
+            pass
+
+
+def _traced_recommend(engine, user_id):
+    with traced():
+        return engine.recommend(user_id, 10)
+
+
+def _traced_spans(k=100):
+    with traced():
+        _spans(k)
+
+
+def measure(fn, calls, repeat=5, budget=0.2):
+    """Median seconds per call; each repeat runs enough loops to take about `budget` seconds."""
+    timer = timeit.Timer(fn)
+    number, elapsed = timer.autorange()
+    number = max(1, int(number * budget / max(elapsed, 1e-9)))
+    return float(np.median(timer.repeat(repeat, number))) / number / calls
+
+
+def run(sizes, only=None, repeat=5):
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in sizes:
+            for name, fn, calls in cases(SIZES[size], workdir):
+                if only and name not in only:
+                    continue
+                key = f'{name}[{size}]'
+                results[key] = measure(fn, calls, repeat)
+                print(f'{key:40s} {results[key] * 1e6:12.2f} us', file=sys.stderr)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Cases slower than baseline x threshold, as {case: (baseline_s, current_s, ratio)}."""
+    regressions = {}
+    for key, seconds in results.items():
+        base = baseline.get(key)
+        if base and seconds / base > threshold:
+            regressions[key] = (base, seconds, seconds / base)
+    return regressions
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    p.add_argument('--sizes', default='small,medium', help=f'comma separated ({", ".join(SIZES)})')
+    p.add_argument('--only', default=None, help='comma separated case names to run')
+    p.add_argument('--repeat', type=int, default=5)
+    p.add_argument('--save', default=None, help='write results as a baseline JSON file')
+    p.add_argument('--baseline', default=None, help='baseline JSON file to compare against')
+    p.add_argument('--threshold', type=float, default=1.5, help='fail when current / baseline exceeds this')
+    a = p.parse_args(argv)
+
+    results = run(a.sizes.split(','), a.only.split(',') if a.only else None, a.repeat)
+    if a.save:
+        os.makedirs(os.path.dirname(a.save) or '.', exist_ok=True)
+        with open(a.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    regressions = {}
+    if a.baseline:
+        with open(a.baseline) as f:
+            regressions = compare(results, json.load(f), a.threshold)
+    print(json.dumps({'results': results, 'threshold': a.threshold,
+                      'regressions': {k: {'baseline_s': b, 'current_s': c, 'ratio': r}
+                                      for k, (b, c, r) in regressions.items()}}, indent=2))
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
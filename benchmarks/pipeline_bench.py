@@ -0,0 +1,118 @@
+"""
+End-to-end ETL -> train -> serve benchmark over synthetic data at several scales.
+
+Each scale point gets its own synthetic project root. Each stage runs in a fresh
+subprocess, so its wall time and peak RSS are measured in isolation. A stage that
+fails (for example, training running out of memory on the dense user-user similarity)
+is recorded with its error rather than aborting the run.
+
+    python -m benchmarks.pipeline_bench --scales 5000,50000,500000 --out pipeline_bench.json
+"""
+import argparse, asyncio, json, os, resource, subprocess, sys, tempfile, time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STAGES = ['generate', 'etl', 'train', 'serve']
+
+
+def scale_point(n_transactions):
+    """Users/products grow with transactions at roughly the ratios of the bundled dataset."""
+    return {'transactions': n_transactions,
+            'users': max(100, n_transactions // 5),
+            'products': max(50, n_transactions // 10)}
+
+
+def _peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_stage(stage, root, point, requests=200):
+    """Runs one stage in-process (inside the child) and returns its measurements."""
+    os.chdir(root)
+    result = {}
+    start = time.perf_counter()
+    if stage == 'generate':
+        from benchmarks.synth_data import generate
+        generate(root, point['users'], point['products'], point['transactions'])
+    elif stage == 'etl':
+        from etl.etl_pipeline import run_etl
+        run_etl()
+    elif stage == 'train':
+        from recommender.train_model import train
+        train()
+    elif stage == 'serve':
+        import numpy as np
+        os.environ['SHOPSENSE_HOME'] = root
+        from api import app as api
+        result['load_seconds'] = time.perf_counter() - start
+        user_ids = api.user_ids.codes[np.random.default_rng(0).integers(0, len(api.user_ids), requests)]
+
+        async def serve():
+            # The handler is a coroutine; await it sequentially on one event loop
+            out = []
+            for uid in user_ids:
+                t = time.perf_counter()
+                await api.recommend(int(uid), 10)
+                out.append((time.perf_counter() - t) * 1000)
+            return out
+        latencies = asyncio.run(serve())
+        result.update({'requests': requests, 'p50_ms': float(np.percentile(latencies, 50)),
+                       'p95_ms': float(np.percentile(latencies, 95)), 'max_ms': float(np.max(latencies))})
+    result['seconds'] = time.perf_counter() - start
+    result['peak_rss_mb'] = _peak_rss_mb()
+    return result
+
+
+def benchmark(scales, workdir, timeout=3600, requests=200):
+    results = []
+    for n in scales:
+        point = scale_point(n)
+        root = os.path.join(workdir, f'scale_{n}')
+        os.makedirs(root, exist_ok=True)
+        entry = dict(point, stages={})
+        for stage in STAGES:
+            cmd = [sys.executable, '-m', 'benchmarks.pipeline_bench', '--stage', stage, '--root', root,
+                   '--point', json.dumps(point), '--requests', str(requests)]
+            env = dict(os.environ, PYTHONPATH=PROJECT_ROOT + os.pathsep + os.environ.get('PYTHONPATH', ''))
+            try:
+                proc = subprocess.run(cmd, env=env, capture_output=True, text=True, timeout=timeout)
+            except subprocess.TimeoutExpired:
+                entry['stages'][stage] = {'error': f'timed out after {timeout}s'}
+                break
+            if proc.returncode != 0:
+                entry['stages'][stage] = {'error': (proc.stderr.strip().splitlines() or [f'exit {proc.returncode}'])[-1]}
+                break
+            entry['stages'][stage] = json.loads(proc.stdout.strip().splitlines()[-1])
+            print(f'[{n} transactions] {stage}: {entry["stages"][stage]}', file=sys.stderr)
+        results.append(entry)
+    return results
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    p.add_argument('--scales', default='5000,50000,500000', help='comma separated transaction counts')
+    p.add_argument('--workdir', default=None, help='where synthetic roots are created (default: temp dir)')
+    p.add_argument('--out', default=None, help='write the JSON results here as well as stdout')
+    p.add_argument('--timeout', type=int, default=3600, help='per-stage timeout in seconds')
+    p.add_argument('--requests', type=int, default=200, help='recommend calls in the serve stage')
+    p.add_argument('--stage', choices=STAGES, help=argparse.SUPPRESS)
+    p.add_argument('--root', help=argparse.SUPPRESS)
+    p.add_argument('--point', help=argparse.SUPPRESS)
+    a = p.parse_args(argv)
+
+    if a.stage:
+        # Child mode: only the final stdout line is read by the driver
+        result = run_stage(a.stage, a.root, json.loads(a.point), a.requests)
+        print(json.dumps(result))
+        return
+
+    workdir = a.workdir or tempfile.mkdtemp(prefix='shopsense_bench_')
+    results = benchmark([int(s) for s in a.scales.split(',')], workdir, a.timeout, a.requests)
+    text = json.dumps({'workdir': workdir, 'results': results}, indent=2)
+    if a.out:
+        with open(a.out, 'w') as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Deterministic synthetic ShopSense dataset at configurable scale.
+
+Writes data/raw/{users,products,transactions_raw,interactions}.csv plus a categorised
+data/processed/products.csv under `root`, in the same formats as the bundled files.
+Item and user activity follow a Zipf-like power law, so a few products dominate sales
+the way they do in real retail data.
+
+    python -m benchmarks.synth_data --root /tmp/shopsense --users 100000 --products 20000 --transactions 10000000
+"""
+import argparse, os
+import numpy as np
+import pandas as pd
+
+CATEGORIES = ['Accessories', 'Clothing', 'Electronics', 'Footwear', 'Home', 'Personal Care']
+FIRST_USER = 10000
+FIRST_INVOICE = 200000
+
+
+def power_law(n, alpha, rng):
+    """Sampling probabilities ∝ 1/rank^alpha, with ranks shuffled so popularity isn't tied to id order."""
+    p = 1.0 / np.arange(1, n + 1) ** alpha
+    return rng.permutation(p / p.sum())
+
+
+def _sample(cdf, size, rng):
+    return np.searchsorted(cdf, rng.random(size) * cdf[-1]).clip(0, len(cdf) - 1)
+
+
+def generate(root, n_users=1000, n_products=500, n_transactions=5000, n_interactions=None,
+             alpha=1.1, mean_basket=3, seed=42, chunksize=1000000):
+    rng = np.random.default_rng(seed)
+    n_interactions = n_transactions if n_interactions is None else n_interactions
+    raw, processed = os.path.join(root, 'data', 'raw'), os.path.join(root, 'data', 'processed')
+    os.makedirs(raw, exist_ok=True)
+    os.makedirs(processed, exist_ok=True)
+
+    user_ids = np.arange(FIRST_USER, FIRST_USER + n_users)
+    stock = np.char.add('P', (100000 + np.arange(n_products)).astype(str))
+    pd.DataFrame({'CustomerID': user_ids, 'UserName': np.char.add('user_', np.arange(n_users).astype(str))}) \
+        .to_csv(os.path.join(raw, 'users.csv'), index=False)
+    price = np.round(rng.lognormal(np.log(400), 0.8, n_products).clip(50, 5000), 2)
+    category = np.asarray(CATEGORIES)[rng.integers(0, len(CATEGORIES), n_products)]
+    pd.DataFrame({'StockCode': stock, 'Description': np.char.add('Product_', np.arange(n_products).astype(str)), 'Price': price}) \
+        .to_csv(os.path.join(raw, 'products.csv'), index=False)
+    pd.DataFrame({'StockCode': stock, 'Description': np.char.add(np.char.add(category, ' item '), np.arange(n_products).astype(str)), 'Category': category}) \
+        .to_csv(os.path.join(processed, 'products.csv'), index=False)
+
+    item_cdf = np.cumsum(power_law(n_products, alpha, rng))
+    user_cdf = np.cumsum(power_law(n_users, alpha * 0.6, rng))
+
+    # Transactions: invoices of geometric size, each invoice owned by one user
+    path, written, invoice = os.path.join(raw, 'transactions_raw.csv'), 0, FIRST_INVOICE
+    while written < n_transactions:
+        size = min(chunksize, n_transactions - written)
+        ends = np.cumsum(rng.geometric(1.0 / mean_basket, size))
+        inv_of_row = np.searchsorted(ends, np.arange(size), side='right')
+        n_inv = int(inv_of_row[-1]) + 1
+        inv_user = user_ids[_sample(user_cdf, n_inv, rng)]
+        pd.DataFrame({
+            'InvoiceNo': np.char.add('INV', (invoice + inv_of_row).astype(str)),
+            'StockCode': stock[_sample(item_cdf, size, rng)],
+            'Quantity': rng.integers(1, 11, size),
+            'CustomerID': inv_user[inv_of_row],
+        }).to_csv(path, mode='w' if written == 0 else 'a', header=written == 0, index=False)
+        written += size
+        invoice += n_inv
+
+    path, written = os.path.join(raw, 'interactions.csv'), 0
+    while written < n_interactions:
+        size = min(chunksize, n_interactions - written)
+        pd.DataFrame({
+            'user_id': user_ids[_sample(user_cdf, size, rng)],
+            'product_id': stock[_sample(item_cdf, size, rng)],
+            'rating': rng.integers(1, 6, size),
+        }).to_csv(path, mode='w' if written == 0 else 'a', header=written == 0, index=False)
+        written += size
+    return root
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    p.add_argument('--root', required=True)
+    p.add_argument('--users', type=int, default=1000)
+    p.add_argument('--products', type=int, default=500)
+    p.add_argument('--transactions', type=int, default=5000)
+    p.add_argument('--interactions', type=int, default=None)
+    p.add_argument('--alpha', type=float, default=1.1)
+    p.add_argument('--seed', type=int, default=42)
+    a = p.parse_args(argv)
+    generate(a.root, a.users, a.products, a.transactions, a.interactions, alpha=a.alpha, seed=a.seed)
+    print('Synthetic data written to', a.root)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+import os
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix, load_npz, save_npz
+
+AGG_DIR = 'data/processed/aggregates'
+POPULARITY_FILE = 'popularity.npz'
+COOCCURRENCE_FILE = 'cooccurrence.npz'
+DEFAULT_CATEGORY = 'General'
+
+
+def item_categories(items, products_paths):
+    """Category name per item index; items missing from every catalog fall back to 'General'."""
+    cats = np.full(len(items), DEFAULT_CATEGORY, dtype=object)
+    for path in products_paths:
+        if not os.path.exists(path):
+            continue
+        df = pd.read_csv(path, dtype=str)
+        code = next((c for c in ['StockCode', 'product_id', 'Stockcode'] if c in df.columns), None)
+        if code is None or 'Category' not in df.columns:
+            continue
+        idx = items.encode(df[code])
+        ok = (idx >= 0) & df['Category'].notna().to_numpy()
+        cats[idx[ok]] = df['Category'].to_numpy()[ok]
+    return cats
+
+
+def _ranked(score, min_score=0):
+    """Item indices ordered by descending score (stable), dropping items at or below min_score."""
+    order = np.argsort(-score, kind='stable').astype(np.int32)
+    return order[score[order] > min_score]
+
+
+def build_aggregates(transactions, n_items, categories, recent_frac=0.2, max_basket=100):
+    """
+    Popularity (overall, per category, trending) and invoice-level co-occurrence tables.
+
+    `transactions` needs InvoiceNo, item_idx and Quantity columns, in time order (or with an
+    InvoiceDate column). Trending compares each item's share of the most recent `recent_frac`
+    of invoices to its overall share. Baskets larger than `max_basket` items are left out of
+    the co-occurrence counts, since their cost grows with the square of the basket size.
+    """
+    item = transactions['item_idx'].to_numpy(dtype=np.int32)
+    qty = transactions['Quantity'].to_numpy(dtype=np.int64)
+    if 'InvoiceDate' in transactions.columns:
+        invoice_time = pd.to_datetime(transactions['InvoiceDate'], errors='coerce').rank(method='dense').fillna(0).to_numpy()
+    else:
+        invoice_time = np.arange(len(transactions))
+    invoice, invoice_codes = pd.factorize(transactions['InvoiceNo'])
+
+    orders = np.bincount(item, minlength=n_items).astype(np.int32)
+    quantity = np.bincount(item, weights=qty, minlength=n_items).astype(np.int64)
+
+    cutoff = np.quantile(invoice_time, 1 - recent_frac) if len(item) else 0
+    recent = invoice_time >= cutoff
+    recent_orders = np.bincount(item[recent], minlength=n_items)
+    share = max(recent.mean(), 1e-9) if len(item) else 1.0
+    trend = ((recent_orders + 1) / (orders * share + 1)).astype(np.float32)
+
+    cat_names, cat_codes = np.unique(categories.astype(str), return_inverse=True)
+    top = _ranked(orders)
+    # Per-category rankings stored flat (CSR style): category c owns cat_items[cat_offsets[c]:cat_offsets[c+1]]
+    cat_of_top = cat_codes[top]
+    by_cat = np.argsort(cat_of_top, kind='stable')
+    cat_items = top[by_cat]
+    cat_offsets = np.concatenate([[0], np.cumsum(np.bincount(cat_of_top, minlength=len(cat_names)))]).astype(np.int64)
+
+    popularity = {
+        'orders': orders, 'quantity': quantity, 'trend': trend,
+        'top_items': top, 'trending_items': _ranked(np.where(recent_orders > 0, trend, 0), min_score=1),
+        'categories': cat_names.astype(str), 'item_category': cat_codes.astype(np.int16),
+        'cat_items': cat_items, 'cat_offsets': cat_offsets,
+    }
+
+    basket_size = np.bincount(invoice, minlength=len(invoice_codes))
+    keep = basket_size[invoice] <= max_basket
+    baskets = csr_matrix((np.ones(keep.sum(), dtype=np.int32), (invoice[keep], item[keep])),
+                         shape=(len(invoice_codes), n_items))
+    baskets.data[:] = 1  # an item bought twice in one invoice still counts once
+    cooc = (baskets.T @ baskets).tocsr()
+    cooc.setdiag(0)
+    cooc.eliminate_zeros()
+    return popularity, cooc.astype(np.int32)
+
+
+def save_aggregates(popularity, cooc, directory=AGG_DIR):
+    os.makedirs(directory, exist_ok=True)
+    np.savez(os.path.join(directory, POPULARITY_FILE), **popularity)
+    save_npz(os.path.join(directory, COOCCURRENCE_FILE), cooc)
+
+
+class Aggregates:
+    """Read-side view over the popularity and co-occurrence artifacts."""
+
+    def __init__(self, popularity, cooc):
+        self.popularity = popularity
+        self.cooc = cooc
+        self.categories = popularity['categories'].tolist()
+
+    def popular(self, n=10, category=None):
+        """Most-ordered item indices overall or within one category name."""
+        if category is None or category == 'All':
+            return self.popularity['top_items'][:n]
+        if category not in self.categories:
+            return np.empty(0, dtype=np.int32)
+        c = self.categories.index(category)
+        start, end = self.popularity['cat_offsets'][c:c + 2]
+        return self.popularity['cat_items'][start:min(end, start + n)]
+
+    def trending(self, n=10):
+        return self.popularity['trending_items'][:n]
+
+    def cooccurring(self, item_idx, n=10):
+        """Items most often bought in the same invoice as `item_idx`, with their counts."""
+        if item_idx < 0 or item_idx >= self.cooc.shape[0]:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int32)
+        start, end = self.cooc.indptr[item_idx:item_idx + 2]
+        idx, counts = self.cooc.indices[start:end], self.cooc.data[start:end]
+        order = np.argsort(-counts, kind='stable')[:n]
+        return idx[order], counts[order]
+
+
+def load_aggregates(directory=AGG_DIR):
+    """Aggregates from disk, or None if the ETL has not produced them."""
+    pop_path = os.path.join(directory, POPULARITY_FILE)
+    cooc_path = os.path.join(directory, COOCCURRENCE_FILE)
+    if not (os.path.exists(pop_path) and os.path.exists(cooc_path)):
+        return None
+    with np.load(pop_path) as f:
+        popularity = {k: f[k] for k in f.files}
+    return Aggregates(popularity, load_npz(cooc_path).tocsr())
@@ -1,13 +1,111 @@
+import pandas as pd, numpy as np, os, json, argparse
+from collections import Counter
 
-import pandas as pd, os
-def run_etl():
-    raw = 'data/raw/transactions_raw.csv'
-    out = 'data/processed/transactions.csv'
-    if os.path.exists(raw):
-        df = pd.read_csv(raw)
-        df.to_csv(out, index=False)
-        print('ETL done, wrote', out)
-    else:
+from etl.aggregates import AGG_DIR, build_aggregates, item_categories, save_aggregates
+from etl.id_maps import ID_MAP_DIR, load_id_maps, save_id_maps
+from etl.store import STORE_PATH, build_catalog, build_store
+from etl.user_profiles import build_user_profiles, save_user_profiles
+from etl.validation import SeenKeys, validate_chunk
+
+RAW = 'data/raw/transactions_raw.csv'
+OUT = 'data/processed/transactions.csv'
+QUARANTINE = 'data/processed/transactions_quarantine.csv'
+REPORT = 'data/processed/validation_report.json'
+USERS = 'data/raw/users.csv'
+PRODUCTS = ['data/raw/products.csv', 'data/processed/products.csv']
+INTERACTIONS = 'data/raw/interactions.csv'
+INTERACTIONS_CLEANED = 'data/processed/interactions_cleaned.csv'
+
+
+def _read_ids(path, candidates):
+    if not os.path.exists(path):
+        return None
+    cols = pd.read_csv(path, nrows=0).columns
+    col = next((c for c in candidates if c in cols), None)
+    return pd.read_csv(path, usecols=[col], dtype=str)[col].dropna() if col else None
+
+
+def seed_id_maps(users, items, users_path=USERS, products_paths=PRODUCTS):
+    """Register the user table and catalog ids first, so their indices don't depend on transaction order."""
+    ids = _read_ids(users_path, ['CustomerID', 'user_id'])
+    if ids is not None: users.extend(ids)
+    for path in products_paths:
+        ids = _read_ids(path, ['StockCode', 'product_id', 'Stockcode'])
+        if ids is not None: items.extend(ids)
+
+
+def run_aggregates(transactions=OUT, agg_dir=AGG_DIR, id_map_dir=ID_MAP_DIR, products_paths=PRODUCTS):
+    """Popularity, trending and co-occurrence lookup tables over the cleaned transactions."""
+    _, items = load_id_maps(id_map_dir)
+    cols = [c for c in ['InvoiceNo', 'InvoiceDate', 'item_idx', 'Quantity'] if c in pd.read_csv(transactions, nrows=0).columns]
+    df = pd.read_csv(transactions, usecols=cols, dtype={'InvoiceNo': 'string'})
+    popularity, cooc = build_aggregates(df, len(items), item_categories(items, products_paths))
+    save_aggregates(popularity, cooc, agg_dir)
+    print('Aggregates done, wrote', agg_dir, f'({cooc.nnz} co-occurrence pairs)')
+
+
+def run_user_profiles(transactions=OUT, agg_dir=AGG_DIR, id_map_dir=ID_MAP_DIR,
+                      interactions=(INTERACTIONS_CLEANED, INTERACTIONS), products_paths=PRODUCTS):
+    """Per-user purchase count, AOV, top categories, price bands and mean rating."""
+    users, items = load_id_maps(id_map_dir)
+    df = pd.read_csv(transactions, usecols=['InvoiceNo', 'user_idx', 'item_idx', 'Quantity'], dtype={'InvoiceNo': 'string'})
+    catalog = build_catalog(items, products_paths)
+    categories, item_category = np.unique(catalog['Category'].astype(str), return_inverse=True)
+    ratings = None
+    path = next((p for p in interactions if os.path.exists(p)), None)
+    if path:
+        r = pd.read_csv(path, usecols=['user_id', 'rating'], dtype={'user_id': str})
+        ratings = pd.DataFrame({'user_idx': users.encode(r['user_id']), 'rating': r['rating'].to_numpy()})
+        ratings = ratings[ratings['user_idx'] >= 0]
+    profiles = build_user_profiles(df, len(users), catalog['Price'].to_numpy(dtype=float), item_category,
+                                   categories, ratings)
+    save_user_profiles(profiles, agg_dir)
+    print('User profiles done, wrote', agg_dir, f'({len(users)} users)')
+
+
+def run_etl(raw=RAW, out=OUT, quarantine=QUARANTINE, report=REPORT, id_map_dir=ID_MAP_DIR,
+            interactions=INTERACTIONS, agg_dir=AGG_DIR, store_path=None, chunksize=250000):
+    if not os.path.exists(raw):
         print('Raw transactions not found at', raw)
+        return
+    users, items = load_id_maps(id_map_dir)
+    seed_id_maps(users, items)
+    seen = SeenKeys()
+    counts = Counter()
+    rows_in = rows_out = rows_rejected = 0
+    reader = pd.read_csv(raw, chunksize=chunksize, dtype={'InvoiceNo': 'string', 'StockCode': 'string', 'CustomerID': 'string'})
+    for i, chunk in enumerate(reader):
+        clean, rejected, chunk_counts = validate_chunk(chunk, seen)
+        users.extend(clean['CustomerID'])
+        items.extend(clean['StockCode'])
+        clean['user_idx'] = users.encode(clean['CustomerID'])
+        clean['item_idx'] = items.encode(clean['StockCode'])
+        mode, header = ('w', True) if i == 0 else ('a', False)
+        clean.to_csv(out, mode=mode, header=header, index=False)
+        rejected.to_csv(quarantine, mode=mode, header=header, index=False)
+        counts.update(chunk_counts)
+        rows_in += len(chunk)
+        rows_out += len(clean)
+        rows_rejected += len(rejected)
+    if os.path.exists(interactions):
+        for chunk in pd.read_csv(interactions, usecols=['user_id', 'product_id'], dtype=str, chunksize=chunksize):
+            users.extend(chunk['user_id'].dropna())
+            items.extend(chunk['product_id'].dropna())
+    save_id_maps(users, items, id_map_dir)
+    summary = {'rows_in': rows_in, 'rows_out': rows_out, 'rows_rejected': rows_rejected,
+               'rules': dict(counts), 'users': len(users), 'items': len(items)}
+    with open(report, 'w') as f:
+        json.dump(summary, f, indent=2)
+    print('ETL done, wrote', out, f'({rows_out} kept, {rows_rejected} quarantined to {quarantine})')
+    run_aggregates(out, agg_dir, id_map_dir)
+    run_user_profiles(out, agg_dir, id_map_dir)
+    if store_path:
+        build_store(users, items, out, interactions, PRODUCTS, store_path, chunksize)
+        print('Store done, wrote', store_path)
+
+
 if __name__=='__main__':
-    run_etl()
+    parser = argparse.ArgumentParser(description='ShopSense ETL')
+    parser.add_argument('--store', nargs='?', const=STORE_PATH, default=None,
+                        help=f'also load the embedded SQLite store (default path: {STORE_PATH})')
+    run_etl(store_path=parser.parse_args().store)
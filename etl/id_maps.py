@@ -0,0 +1,77 @@
+import os
+import numpy as np
+import pandas as pd
+
+ID_MAP_DIR = 'data/processed/id_maps'
+USER_MAP_FILE = 'users.csv'
+ITEM_MAP_FILE = 'items.csv'
+
+
+def normalize_codes(codes):
+    """External ids as stripped strings, so 10457, 10457.0 and '10457' map to the same entry."""
+    s = pd.Series(codes)
+    if pd.api.types.is_float_dtype(s) and (s.dropna() % 1 == 0).all():
+        s = s.astype('Int64')
+    return s.astype('string').str.strip().to_numpy(dtype=object)
+
+
+class IdMap:
+    """
+    Append-only dictionary from external codes (CustomerID/user_id, StockCode/product_id)
+    to dense int32 indices. The index of a code is its row in the persisted file and never
+    changes once assigned, so ETL, training and serving all agree on it.
+    """
+
+    def __init__(self, codes=()):
+        self.index = pd.Index(normalize_codes(list(codes)), dtype=object)
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def codes(self):
+        return self.index.to_numpy()
+
+    def extend(self, codes):
+        """Append codes not seen before, in first-seen order. Returns the number added."""
+        codes = pd.unique(normalize_codes(codes))
+        new = codes[self.index.get_indexer(codes) < 0]
+        if len(new):
+            self.index = self.index.append(pd.Index(new, dtype=object))
+        return len(new)
+
+    def encode(self, codes):
+        """int32 indices for `codes`; unknown codes map to -1."""
+        return self.index.get_indexer(normalize_codes(codes)).astype(np.int32)
+
+    def decode(self, idx):
+        return self.codes[np.asarray(idx, dtype=np.int64)]
+
+    def get(self, code):
+        """Index of a single code, or None if unknown."""
+        try:
+            return int(self.index.get_loc(str(code).strip()))
+        except KeyError:
+            return None
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        pd.DataFrame({'code': self.codes}).to_csv(path, index=False)
+
+    @classmethod
+    def load(cls, path):
+        if not os.path.exists(path):
+            return cls()
+        m = cls()
+        m.index = pd.Index(pd.read_csv(path, dtype=str, keep_default_na=False)['code'].to_numpy(dtype=object), dtype=object)
+        return m
+
+
+def load_id_maps(directory=ID_MAP_DIR):
+    """(users, items) id maps; empty maps if the ETL has not built them yet."""
+    return IdMap.load(os.path.join(directory, USER_MAP_FILE)), IdMap.load(os.path.join(directory, ITEM_MAP_FILE))
+
+
+def save_id_maps(users, items, directory=ID_MAP_DIR):
+    users.save(os.path.join(directory, USER_MAP_FILE))
+    items.save(os.path.join(directory, ITEM_MAP_FILE))
@@ -0,0 +1,149 @@
+"""
+Optional embedded SQLite store for the catalog, transactions and interactions.
+
+The ETL bulk-loads it into a temp file and swaps it into place, so readers never see a
+half-built database. Consumers open it read-only and do indexed point lookups
+(one user's history, one product's row, one category) instead of scanning CSVs.
+"""
+import os, sqlite3, threading
+import numpy as np
+import pandas as pd
+
+from etl.aggregates import item_categories
+
+STORE_PATH = 'data/processed/shopsense.db'
+
+INDEXES = [
+    'CREATE UNIQUE INDEX idx_users_user_id ON users(user_id)',
+    'CREATE UNIQUE INDEX idx_products_stockcode ON products(StockCode)',
+    'CREATE INDEX idx_products_category ON products(Category)',
+    'CREATE INDEX idx_transactions_user ON transactions(user_idx)',
+    'CREATE INDEX idx_transactions_item ON transactions(item_idx)',
+    'CREATE INDEX idx_interactions_user ON interactions(user_idx)',
+    'CREATE INDEX idx_interactions_item ON interactions(item_idx)',
+]
+
+
+def build_catalog(items, products_paths, interactions=None):
+    """One row per item index: StockCode, Description, Category, Price and mean interaction Rating."""
+    catalog = pd.DataFrame({'item_idx': np.arange(len(items), dtype=np.int32), 'StockCode': items.codes,
+                            'Description': None, 'Price': np.nan, 'Rating': np.nan})
+    for path in products_paths:
+        if not os.path.exists(path):
+            continue
+        df = pd.read_csv(path)
+        code = next((c for c in ['StockCode', 'product_id', 'Stockcode'] if c in df.columns), None)
+        if code is None:
+            continue
+        idx = items.encode(df[code])
+        ok = idx >= 0
+        for col in ['Description', 'Price']:
+            if col in df.columns:
+                catalog.loc[idx[ok], col] = df.loc[ok, col].to_numpy()
+    catalog['Description'] = catalog['Description'].fillna('Product ' + catalog['StockCode'])
+    catalog['Category'] = item_categories(items, products_paths)
+    if interactions is not None and len(interactions):
+        sums = np.bincount(interactions['item_idx'], weights=interactions['rating'], minlength=len(items))
+        counts = np.bincount(interactions['item_idx'], minlength=len(items))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            catalog['Rating'] = np.round(sums / counts, 1)
+    return catalog
+
+
+def encode_interactions(users, items, interactions_path):
+    """user_idx/item_idx/rating frame of the interactions file for known users and items, or None if it is missing."""
+    if not os.path.exists(interactions_path):
+        return None
+    interactions = pd.read_csv(interactions_path, usecols=['user_id', 'product_id', 'rating'])
+    interactions = pd.DataFrame({'user_idx': users.encode(interactions['user_id']),
+                                 'item_idx': items.encode(interactions['product_id']),
+                                 'rating': interactions['rating'].to_numpy()})
+    return interactions[(interactions['user_idx'] >= 0) & (interactions['item_idx'] >= 0)]
+
+
+def catalog_frame(users, items, products_paths, interactions_path):
+    """The products table exactly as the store holds it, for consumers that keep the catalog in memory."""
+    return build_catalog(items, products_paths, encode_interactions(users, items, interactions_path))
+
+
+def build_store(users, items, transactions_path, interactions_path, products_paths, path=STORE_PATH, chunksize=250000):
+    tmp = path + '.tmp'
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    con = sqlite3.connect(tmp)
+    con.execute('PRAGMA journal_mode=OFF')
+    con.execute('PRAGMA synchronous=OFF')
+    pd.DataFrame({'user_idx': np.arange(len(users), dtype=np.int32), 'user_id': users.codes}) \
+        .to_sql('users', con, index=False)
+
+    interactions = encode_interactions(users, items, interactions_path)
+    if interactions is not None:
+        interactions.to_sql('interactions', con, index=False, chunksize=chunksize)
+    else:
+        con.execute('CREATE TABLE interactions (user_idx INTEGER, item_idx INTEGER, rating REAL)')
+
+    build_catalog(items, products_paths, interactions).to_sql('products', con, index=False)
+    cols = ['InvoiceNo', 'user_idx', 'item_idx', 'Quantity']
+    for i, chunk in enumerate(pd.read_csv(transactions_path, usecols=cols, chunksize=chunksize)):
+        chunk.to_sql('transactions', con, index=False, if_exists='fail' if i == 0 else 'append')
+    # Indexes are cheaper to build once after the bulk load than to maintain row by row
+    for stmt in INDEXES:
+        con.execute(stmt)
+    con.execute('ANALYZE')
+    con.commit()
+    con.close()
+    os.replace(tmp, path)
+
+
+class Store:
+    """Read-only access to the store; one connection per thread, since FastAPI runs sync handlers in a pool."""
+
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        self._local = threading.local()
+
+    @property
+    def con(self):
+        con = getattr(self._local, 'con', None)
+        if con is None:
+            con = sqlite3.connect(f'file:{os.path.abspath(self.path)}?mode=ro', uri=True, check_same_thread=False)
+            con.row_factory = sqlite3.Row
+            self._local.con = con
+        return con
+
+    def _rows(self, sql, params=()):
+        return [dict(r) for r in self.con.execute(sql, params).fetchall()]
+
+    def product(self, code):
+        rows = self._rows('SELECT * FROM products WHERE StockCode = ?', (str(code),))
+        return rows[0] if rows else None
+
+    def products(self, codes):
+        """Catalog rows for `codes`, in the order given; unknown codes are skipped."""
+        codes = [str(c) for c in codes]
+        if not codes:
+            return []
+        rows = self._rows(f'SELECT * FROM products WHERE StockCode IN ({",".join("?" * len(codes))})', codes)
+        by_code = {r['StockCode']: r for r in rows}
+        return [by_code[c] for c in codes if c in by_code]
+
+    def products_in_category(self, category, limit=50):
+        return self._rows('SELECT * FROM products WHERE Category = ? LIMIT ?', (category, limit))
+
+    def user_history(self, user_id, limit=100):
+        """A user's cleaned transactions joined to the catalog, most recent invoices first."""
+        return self._rows(
+            'SELECT t.InvoiceNo, t.Quantity, p.StockCode, p.Description, p.Category, p.Price '
+            'FROM users u JOIN transactions t ON t.user_idx = u.user_idx '
+            'JOIN products p ON p.item_idx = t.item_idx '
+            'WHERE u.user_id = ? ORDER BY t.rowid DESC LIMIT ?', (str(user_id), limit))
+
+    def user_ratings(self, user_id):
+        return self._rows(
+            'SELECT p.StockCode, i.rating FROM users u JOIN interactions i ON i.user_idx = u.user_idx '
+            'JOIN products p ON p.item_idx = i.item_idx WHERE u.user_id = ?', (str(user_id),))
+
+
+def open_store(path=STORE_PATH):
+    """Store if the ETL has built one, else None (the store is optional)."""
+    return Store(path) if os.path.exists(path) else None
@@ -0,0 +1,121 @@
+"""
+Per-user profile aggregates, precomputed by the ETL.
+
+Every field is a flat array indexed by user_idx (the shared id map), so serving a
+profile is a handful of array reads rather than a scan or sample of transactions.
+"""
+import os
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix
+
+from etl.aggregates import AGG_DIR
+
+PROFILES_FILE = 'user_profiles.npz'
+PRICE_BINS = [0, 500, 1000, 2000, 5000]
+PRICE_LABELS = ['Under ₹500', '₹500-₹1000', '₹1000-₹2000', 'Over ₹2000']
+TOP_CATEGORIES = 5
+
+
+def build_user_profiles(transactions, n_users, item_price, item_category, categories, ratings=None,
+                        top_k=TOP_CATEGORIES):
+    """
+    Profile arrays from cleaned transactions (InvoiceNo, user_idx, item_idx, Quantity).
+
+    `item_price` (float, NaN when unknown) and `item_category` (codes into `categories`) are
+    indexed by item_idx. `ratings` is an optional (user_idx, rating) frame of interactions.
+    """
+    user = transactions['user_idx'].to_numpy(dtype=np.int64)
+    item = transactions['item_idx'].to_numpy(dtype=np.int64)
+    qty = transactions['Quantity'].to_numpy(dtype=np.float64)
+    price = item_price[item]
+    priced = ~np.isnan(price)
+
+    purchases = np.bincount(user, minlength=n_users).astype(np.int32)
+    # Orders are distinct (user, invoice) pairs
+    invoice = pd.factorize(transactions['InvoiceNo'])[0]
+    pairs = np.unique(user * (invoice.max(initial=0) + 1) + invoice)
+    orders = np.bincount(pairs // (invoice.max(initial=0) + 1), minlength=n_users).astype(np.int32)
+    spend = np.bincount(user[priced], weights=(price * qty)[priced], minlength=n_users)
+    priced_lines = np.bincount(user[priced], minlength=n_users)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        aov = (spend / np.where(priced_lines > 0, orders, 0)).astype(np.float32)
+        avg_price = (np.bincount(user[priced], weights=price[priced], minlength=n_users) / priced_lines).astype(np.float32)
+
+    # Top categories: per-user counts as a sparse (user, category) matrix, ranked within each row
+    cat = item_category[item].astype(np.int64)
+    counts = coo_matrix((np.ones(len(user), dtype=np.int32), (user, cat)), shape=(n_users, len(categories))).tocsr()
+    counts.sum_duplicates()
+    rows = np.repeat(np.arange(n_users), np.diff(counts.indptr))
+    order = np.lexsort((counts.indices, -counts.data, rows))
+    rank = np.arange(len(order)) - counts.indptr[rows[order]]
+    keep = order[rank < top_k]
+    top_categories = np.full((n_users, top_k), -1, dtype=np.int16)
+    top_counts = np.zeros((n_users, top_k), dtype=np.int32)
+    top_categories[rows[keep], rank[rank < top_k]] = counts.indices[keep]
+    top_counts[rows[keep], rank[rank < top_k]] = counts.data[keep]
+
+    band = np.digitize(price, PRICE_BINS, right=True) - 1  # same edges as pd.cut: (0, 500], (500, 1000], ...
+    in_band = priced & (band >= 0) & (band < len(PRICE_LABELS))
+    price_hist = np.bincount(user[in_band] * len(PRICE_LABELS) + band[in_band],
+                             minlength=n_users * len(PRICE_LABELS)).reshape(n_users, -1).astype(np.int32)
+
+    avg_rating = np.full(n_users, np.nan, dtype=np.float32)
+    if ratings is not None and len(ratings):
+        r_user = ratings['user_idx'].to_numpy(dtype=np.int64)
+        r_sum = np.bincount(r_user, weights=ratings['rating'].to_numpy(dtype=np.float64), minlength=n_users)
+        r_count = np.bincount(r_user, minlength=n_users)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            avg_rating = (r_sum / r_count).astype(np.float32)
+
+    return {
+        'purchases': purchases, 'orders': orders, 'aov': aov, 'avg_price': avg_price, 'avg_rating': avg_rating,
+        'top_categories': top_categories, 'top_category_counts': top_counts, 'price_hist': price_hist,
+        'categories': np.asarray(categories, dtype=str), 'price_labels': np.asarray(PRICE_LABELS),
+    }
+
+
+def save_user_profiles(profiles, directory=AGG_DIR):
+    os.makedirs(directory, exist_ok=True)
+    np.savez(os.path.join(directory, PROFILES_FILE), **profiles)
+
+
+def _num(value):
+    return None if np.isnan(value) else round(float(value), 2)
+
+
+class UserProfiles:
+    """O(1) profile lookups by user_idx over the precomputed arrays."""
+
+    def __init__(self, arrays):
+        self.arrays = arrays
+        self.categories = arrays['categories'].tolist()
+        self.price_labels = arrays['price_labels'].tolist()
+
+    def __len__(self):
+        return len(self.arrays['purchases'])
+
+    def get(self, user_idx):
+        """Profile dict for a user index, or None if it is outside the table."""
+        if user_idx is None or not 0 <= user_idx < len(self):
+            return None
+        a = self.arrays
+        cats = a['top_categories'][user_idx]
+        return {
+            'purchases': int(a['purchases'][user_idx]),
+            'orders': int(a['orders'][user_idx]),
+            'aov': _num(a['aov'][user_idx]),
+            'avg_price': _num(a['avg_price'][user_idx]),
+            'avg_rating': _num(a['avg_rating'][user_idx]),
+            'top_categories': {self.categories[c]: int(n) for c, n in zip(cats, a['top_category_counts'][user_idx]) if c >= 0},
+            'price_bands': dict(zip(self.price_labels, a['price_hist'][user_idx].tolist())),
+        }
+
+
+def load_user_profiles(directory=AGG_DIR):
+    """UserProfiles from disk, or None if the ETL has not produced them."""
+    path = os.path.join(directory, PROFILES_FILE)
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as f:
+        return UserProfiles({k: f[k] for k in f.files})
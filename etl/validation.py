@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+
+KEY_COLUMNS = ['InvoiceNo', 'StockCode', 'CustomerID']
+REQUIRED_COLUMNS = KEY_COLUMNS + ['Quantity']
+MAX_QUANTITY = 10000
+
+# Reason codes in evaluation order; a rejected row is quarantined under the first rule it fails
+RULES = [
+    'missing_invoice',
+    'missing_stockcode',
+    'missing_customer',
+    'bad_customer',
+    'bad_quantity',
+    'nonpositive_quantity',
+    'quantity_out_of_range',
+]
+DUPLICATE = 'duplicate'
+
+
+class SeenKeys:
+    """Sorted array of 64-bit key hashes, used to drop duplicates across chunks."""
+
+    def __init__(self):
+        self.hashes = np.empty(0, dtype=np.uint64)
+
+    def mark(self, hashes):
+        """Return a mask of hashes already seen (earlier chunk or earlier in this batch) and remember the rest."""
+        pos = np.searchsorted(self.hashes, hashes)
+        found = np.zeros(len(hashes), dtype=bool)
+        inside = pos < len(self.hashes)
+        found[inside] = self.hashes[pos[inside]] == hashes[inside]
+        dup = found | pd.Series(hashes).duplicated().to_numpy()
+        self.hashes = np.union1d(self.hashes, hashes[~dup])
+        return dup
+
+
+def check_schema(df):
+    missing = [c for c in REQUIRED_COLUMNS if c not in df.columns]
+    if missing:
+        raise ValueError(f'transactions are missing required columns: {missing}')
+
+
+def key_hashes(df):
+    """uint64 hash of the (InvoiceNo, StockCode, CustomerID) key of each row."""
+    return pd.util.hash_pandas_object(df[KEY_COLUMNS], index=False).to_numpy()
+
+
+def validate_chunk(df, seen=None):
+    """
+    Apply schema, range and duplicate rules to a raw transactions chunk.
+    Returns (clean, rejected, counts): clean rows with normalized key/quantity dtypes,
+    the original rejected rows with a `reason` column, and per-rule failure counts.
+    """
+    check_schema(df)
+    invoice = df['InvoiceNo'].astype('string').str.strip()
+    stock = df['StockCode'].astype('string').str.strip()
+    customer = pd.to_numeric(df['CustomerID'], errors='coerce')
+    quantity = pd.to_numeric(df['Quantity'], errors='coerce')
+
+    missing_customer = df['CustomerID'].isna()
+    masks = [
+        invoice.fillna('').eq(''),
+        stock.fillna('').eq(''),
+        missing_customer,
+        (customer.isna() & ~missing_customer) | (customer % 1).fillna(0).ne(0) | customer.lt(0),
+        quantity.isna() | (quantity % 1).fillna(0).ne(0),
+        quantity.le(0),
+        quantity.gt(MAX_QUANTITY),
+    ]
+    masks = [m.to_numpy(dtype=bool, na_value=False) for m in masks]
+    counts = {rule: int(mask.sum()) for rule, mask in zip(RULES, masks)}
+    reason = np.select(masks, RULES, default='')
+
+    valid = reason == ''
+    clean = df[valid].copy()
+    clean['InvoiceNo'] = invoice[valid]
+    clean['StockCode'] = stock[valid]
+    clean['CustomerID'] = customer[valid].astype('int64')
+    clean['Quantity'] = quantity[valid].astype('int64')
+
+    dup = key_hashes(clean)
+    dup = seen.mark(dup) if seen is not None else pd.Series(dup).duplicated().to_numpy()
+    counts[DUPLICATE] = int(dup.sum())
+    reason[np.flatnonzero(valid)[dup]] = DUPLICATE
+
+    rejected = df[reason != ''].copy()
+    rejected['reason'] = reason[reason != '']
+    return clean[~dup], rejected, counts
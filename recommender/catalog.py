@@ -0,0 +1,153 @@
+import time
+import numpy as np
+import pandas as pd
+
+from recommender.search import SearchIndex
+
+
+def safe_read_products(path):
+    if not path.exists():
+        # create a tiny fallback DataFrame if missing
+        df = pd.DataFrame([
+            ("P100027","Formal Shirt","Clothing",299.0,4.3,"https://via.placeholder.com/240x240.png?text=P100027"),
+            ("P100339","Travel Bottle","Home",149.0,4.0,"https://via.placeholder.com/240x240.png?text=P100339"),
+            ("P100118","Smartphone Case","Electronics",399.0,4.2,"https://via.placeholder.com/240x240.png?text=P100118"),
+            ("P100195","Backpack","Accessories",999.0,4.5,"https://via.placeholder.com/240x240.png?text=P100195"),
+            ("P100212","Digital Alarm Clock","Electronics",499.0,3.9,"https://via.placeholder.com/240x240.png?text=P100212"),
+        ], columns=["StockCode","Description","Category","Price","Rating","ImageURL"])
+        return df
+    df = pd.read_csv(path)
+    # normalize columns
+    if "StockCode" not in df.columns:
+        # try fallback names
+        if "product_id" in df.columns: df = df.rename(columns={"product_id":"StockCode"})
+        elif "Stockcode" in df.columns: df = df.rename(columns={"Stockcode":"StockCode"})
+    return ensure_product_columns(df)
+
+def ensure_product_columns(df):
+    # ensure required columns
+    if "Description" not in df.columns: df["Description"] = "Product " + df["StockCode"].astype(str)
+    if "Category" not in df.columns: df["Category"] = "General"
+    if "Price" not in df.columns:
+        # create synthetic prices
+        np.random.seed(42)
+        df["Price"] = np.round(np.random.uniform(100, 2500, size=len(df)), 2)
+    if "Rating" not in df.columns:
+        np.random.seed(1)
+        df["Rating"] = np.round(np.random.uniform(3.5, 5.0, size=len(df)), 1)
+    if "ImageURL" not in df.columns:
+        # placeholder images
+        df["ImageURL"] = "https://via.placeholder.com/240x240.png?text=" + df["StockCode"].astype(str)
+    return df
+
+
+def build_neighbor_table(df, k=8, window=32, chunk=65536):
+    """
+    Top-k similar products per row, as an int32 (len(df), k) array of row positions padded with -1.
+
+    Candidates are the `window` nearest-priced products on each side within the same category.
+    They are scored by rating percentile within the category (x2) minus relative price distance,
+    the same signals the old per-request similar_products() used. Work is O(n * window), done
+    in row chunks to bound memory.
+    """
+    n = len(df)
+    table = np.full((n, k), -1, dtype=np.int32)
+    if n < 2:
+        return table
+    cat = pd.factorize(df["Category"].astype(str))[0]
+    price = df["Price"].to_numpy(dtype=np.float64)
+    rating_pct = df.groupby(cat)["Rating"].rank(pct=True).to_numpy(dtype=np.float64)
+
+    order = np.lexsort((price, cat))  # sorted by category, then price
+    s_cat = cat[order]
+    bounds = np.flatnonzero(np.diff(s_cat)) + 1
+    group_start = np.repeat(np.concatenate([[0], bounds]), np.diff(np.concatenate([[0], bounds, [n]])))
+    group_end = np.repeat(np.concatenate([bounds, [n]]), np.diff(np.concatenate([[0], bounds, [n]])))
+    offsets = np.concatenate([np.arange(-window, 0), np.arange(1, window + 1)])
+
+    for lo in range(0, n, chunk):
+        rows = np.arange(lo, min(lo + chunk, n))
+        cand = rows[:, None] + offsets[None, :]
+        valid = (cand >= group_start[rows, None]) & (cand < group_end[rows, None])
+        cand = np.where(valid, cand, rows[:, None])
+        me, other = order[rows][:, None], order[cand]
+        score = 2 * rating_pct[other] - np.abs(price[other] - price[me]) / (price[me] + 1)
+        score[~valid] = -np.inf
+        kk = min(k, score.shape[1])
+        top = np.argpartition(-score, kk - 1, axis=1)[:, :kk]
+        top = np.take_along_axis(top, np.argsort(-np.take_along_axis(score, top, axis=1), axis=1, kind="stable"), axis=1)
+        picked = np.take_along_axis(other, top, axis=1)
+        picked[~np.take_along_axis(valid, top, axis=1)] = -1
+        table[order[rows], :kk] = picked
+    return table
+
+
+class CatalogIndex:
+    """
+    A loaded catalog plus the structures derived from it (category list, per-category
+    row groups, StockCode -> row lookup, similar-product neighbor table, search index).
+    Built once per catalog file version and shared read-only, so callers must not mutate `df`.
+    """
+
+    def __init__(self, df, version=None):
+        start = time.perf_counter()
+        self.df = df.drop_duplicates("StockCode").reset_index(drop=True)
+        self.version = version
+        self.categories = ["All"] + sorted(self.df["Category"].astype(str).unique().tolist())
+        self.by_category = {str(k): v for k, v in self.df.groupby("Category").indices.items()}
+        self.by_code = pd.Index(self.df["StockCode"].astype(str))
+        self.neighbors = build_neighbor_table(self.df)
+        self.search_index = SearchIndex(self.df)
+        self.built_at = time.perf_counter()
+        self.build_ms = (self.built_at - start) * 1000
+
+    def __len__(self):
+        return len(self.df)
+
+    def positions(self, codes):
+        """Row positions of `codes`, in order, skipping unknown codes."""
+        pos = self.by_code.get_indexer([str(c) for c in codes])
+        return pos[pos >= 0]
+
+    def rows(self, codes):
+        return self.df.iloc[self.positions(codes)]
+
+    def similar(self, code, top_k=4):
+        """Precomputed similar products for `code` as records; O(k) per lookup."""
+        pos = self.positions([code])
+        if not len(pos):
+            return []
+        nb = self.neighbors[pos[0], :top_k]
+        return self.df.iloc[nb[nb >= 0]].to_dict("records")
+
+    def search(self, query, limit=20, category="All"):
+        """Ranked rows matching `query` via the search index, optionally within a category."""
+        mask = None
+        if category != "All":
+            mask = np.zeros(len(self.df), dtype=bool)
+            mask[self.by_category.get(category, [])] = True
+        return self.df.iloc[self.search_index.search(query, limit, mask)]
+
+    def filter(self, query="", category="All"):
+        """All rows matching `query` (ranked) within a category; the whole category if no query."""
+        if query:
+            return self.search(query, None, category)
+        if category != "All":
+            return self.df.iloc[self.by_category.get(category, np.empty(0, dtype=np.int64))]
+        return self.df
+
+
+def load_catalog(path):
+    """CatalogIndex for the products file, versioned by its modification time."""
+    version = path.stat().st_mtime_ns if path.exists() else None
+    return CatalogIndex(safe_read_products(path), version)
+
+
+def merged_catalog(frame, version=None):
+    """
+    CatalogIndex over the store's products table (etl.store.catalog_frame), filled the way
+    store lookups are, so the gallery, search and similar products quote the same price and
+    rating as the store.
+    """
+    df = ensure_product_columns(frame.drop(columns=["item_idx"]))
+    return CatalogIndex(df.fillna({"Price": 0.0, "Rating": 0.0}), version)
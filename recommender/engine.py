@@ -0,0 +1,243 @@
+import os, pickle
+import numpy as np
+
+from recommender.tracing import span
+from etl.id_maps import ID_MAP_DIR, load_id_maps
+from recommender.session import SessionRecommender
+
+# Users with fewer purchased items than this are answered by the cold-start path
+MIN_HISTORY = 3
+# Neighbours searched per requested item when filters narrow the candidate items
+FILTERED_NEIGHBOURS = 10
+
+
+class Recommender:
+    """
+    User-based collaborative filtering over the trained model artifact.
+
+    Shared by the FastAPI service and the Streamlit app's embedded mode, so both return
+    the same recommendations for the same user. Given the ETL aggregates, users the model
+    cannot score (unknown, or under MIN_HISTORY items) are answered from precomputed
+    popularity lists. These are blended with co-occurrence neighbours of any items the
+    user is known to have interacted with. Given ItemFilters, requests can be constrained
+    by category, price range and an exclude list.
+    """
+
+    def __init__(self, model, user_ids, item_ids, aggregates=None, filters=None):
+        self.model = model
+        self.similarity = model["similarity"]
+        # Set for int8 models (recommender.quantize): similarity = stored value * scale[row]
+        self.similarity_scale = model.get("similarity_scale")
+        self.matrix = model["matrix"]
+        self.user_ids = user_ids
+        self.item_ids = item_ids
+        self.aggregates = aggregates
+        self.filters = filters
+        # Optional MaterializedTable: unconstrained requests for unchanged users become lookups
+        self.materialized = None
+        self.session = SessionRecommender(aggregates, item_ids) if aggregates is not None else None
+
+    @property
+    def n_users(self):
+        return self.similarity.shape[0]
+
+    def user_index(self, user_id):
+        """Model row for `user_id`, or None if the user was not in the training data."""
+        idx = self.user_ids.get(user_id)
+        return None if idx is None or idx >= self.n_users else idx
+
+    def is_warm(self, idx):
+        """Whether model row `idx` is answered collaboratively rather than by the cold-start path."""
+        return idx is not None and (len(self.history(idx)) >= MIN_HISTORY or self.aggregates is None)
+
+    def nearest_users(self, idx, n=10):
+        """The `n` users most similar to row `idx` (excluding itself), nearest first."""
+        return self.nearest_users_batch([idx], n)[0]
+
+    def nearest_users_batch(self, idxs, n=10):
+        """
+        nearest_users() for several rows at once as a (len(idxs), n) array. The rows are
+        gathered into one block, and a single argpartition finds every row's top n.
+        Only those n are then sorted (by similarity, ties by user index), not the whole row.
+        """
+        idxs = np.asarray(idxs, dtype=np.int64)
+        k = min(n, self.n_users - 1)
+        if k <= 0:
+            return np.empty((len(idxs), 0), dtype=np.int64)
+        with span("neighbor_selection"):
+            # Ranks on the stored values whatever their precision: a row's int8 scale is positive.
+            # Integer rows are widened to float32 first; NumPy partitions floats ~3x faster.
+            block = self.similarity[idxs]
+            neg = -(block if block.dtype.kind == "f" else block.astype(np.float32))
+            neg[np.arange(len(idxs)), idxs] = np.inf  # never a neighbour of itself
+            top = np.argpartition(neg, k - 1, axis=1)[:, :k]
+            top_neg = np.take_along_axis(neg, top, axis=1)
+            # argpartition keeps arbitrary members of a tie at the k-th value; take the lowest user
+            # indices instead, so the top n is always a prefix of any wider top list
+            kth = top_neg.max(axis=1)
+            for r in np.flatnonzero(np.count_nonzero(neg <= kth[:, None], axis=1) > k):
+                candidates = np.flatnonzero(neg[r] <= kth[r])
+                top[r] = candidates[np.lexsort((candidates, neg[r, candidates]))[:k]]
+                top_neg[r] = neg[r, top[r]]
+            order = np.lexsort((top, top_neg), axis=1)
+            return np.take_along_axis(top, order, axis=1)
+
+    def collect_items(self, users, n=10, allowed=None):
+        """
+        Up to `n` distinct items from the purchase rows of `users`, in order, and for each
+        item the position in `users` of the neighbour it came from. Items outside the
+        `allowed` mask are skipped.
+        """
+        mat = self.matrix
+        if allowed is not None:
+            return self._collect_allowed(users, n, allowed)
+        recommended, owners = [], []
+        seen = set()
+        for pos, u in enumerate(users):
+            for item_idx in mat.indices[mat.indptr[u]:mat.indptr[u + 1]]:
+                if item_idx not in seen:
+                    seen.add(item_idx)
+                    recommended.append(item_idx)
+                    owners.append(pos)
+                if len(recommended) >= n: break
+            if len(recommended) >= n: break
+        return np.asarray(recommended, dtype=np.int32), np.asarray(owners, dtype=np.int64)
+
+    def _collect_allowed(self, users, n, allowed):
+        # A narrow mask can reject most rows, so gather every neighbour's row at once instead of
+        # looping until `n` items pass: concatenate the CSR rows in neighbour order, mask, keep first occurrences
+        mat = self.matrix
+        users = np.asarray(users, dtype=np.int64)
+        starts, ends = mat.indptr[users], mat.indptr[users + 1]
+        lens = ends - starts
+        pos = np.repeat(starts - np.cumsum(lens) + lens, lens) + np.arange(lens.sum())
+        items, owners = mat.indices[pos], np.repeat(np.arange(len(users)), lens)
+        keep = allowed[items]
+        items, owners = items[keep], owners[keep]
+        _, first = np.unique(items, return_index=True)
+        first = np.sort(first)[:n]
+        return items[first].astype(np.int32), owners[first].astype(np.int64)
+
+    def score(self, idx, n=10, allowed=None, users=None):
+        """
+        (item indices, float32 scores) for model row `idx`, best first. Each item is scored
+        by the similarity of the nearest neighbour that bought it. With an `allowed` mask the
+        search widens to FILTERED_NEIGHBOURS x n neighbours so constrained lists still fill up.
+        `users` passes neighbours already found by nearest_users_batch().
+        """
+        if users is None:
+            users = self.nearest_users(idx, n if allowed is None else n * FILTERED_NEIGHBOURS)
+        with span("matrix_access"):
+            items, owners = self.collect_items(users, n, allowed)
+            scores = np.asarray(self.similarity[idx][users[owners]], dtype=np.float32)
+            return items, scores * self.similarity_scale[idx] if self.similarity_scale is not None else scores
+
+    def recommend_indices(self, idx, n=10):
+        """Item indices from the purchase rows of the most similar users, nearest first."""
+        return self.score(idx, n)[0]
+
+    def history(self, idx):
+        """Item indices in the user's training row (empty for users outside the model)."""
+        if idx is None:
+            return np.empty(0, dtype=np.int32)
+        return self.matrix.indices[self.matrix.indptr[idx]:self.matrix.indptr[idx + 1]]
+
+    def popular(self, n, exclude=(), category=None, allowed=None):
+        """Up to `n` of the most ordered items (within `category` if it is known and `allowed`), skipping `exclude`."""
+        if category is not None and category not in self.aggregates.categories:
+            category = None
+        if allowed is None:
+            top = self.aggregates.popular(n + len(exclude), category)
+        else:
+            # The whole ranking: a narrow mask may reject most of the head
+            top = self.aggregates.popular(len(allowed), category)
+            top = top[allowed[top]]
+        return top[~np.isin(top, exclude)][:n].astype(np.int32)
+
+    def popularity_score(self, items):
+        """Order count relative to the best seller: the score reported for cold-start items."""
+        orders = self.aggregates.popularity["orders"]
+        return (orders[items] / max(int(orders.max(initial=0)), 1)).astype(np.float32)
+
+    def recommend_scored(self, user_id, n=10, interactions=(), category=None, min_price=None, max_price=None,
+                         exclude=(), neighbours=None):
+        """
+        (item indices, float32 scores, source) for `user_id`, or None if the user cannot be
+        scored and no aggregates are loaded. `interactions` are StockCodes the user has
+        interacted with outside the training data. They seed the cold-start blend.
+
+        With item filters loaded, `category`, the price range and `exclude` (StockCodes) are
+        applied while scoring, so every source returns up to `n` items that satisfy them.
+        Without filters, `exclude` is still applied, and `category` only steers the popular fallback.
+
+        source is "collaborative", "collaborative+popular" (topped up), "co_occurrence"
+        (cold start seeded by known items) or "popular". `neighbours` is used by
+        recommend_scored_many() to hand over a batched neighbour search.
+        """
+        # Per-code lookups: for a request's handful of codes they beat a vectorized encode
+        excluded = [i for i in map(self.item_ids.get, exclude) if i is not None]
+        allowed = None
+        if self.filters is not None:
+            allowed = self.filters.mask(category, min_price, max_price, excluded)
+        elif excluded:
+            allowed = np.ones(len(self.item_ids), dtype=bool)
+            allowed[excluded] = False
+        with span("model_lookup"):
+            idx = self.user_index(user_id)
+            hit = None
+            if self.materialized is not None and allowed is None and category is None and not len(interactions):
+                hit = self.materialized.lookup(idx, n)
+            history = self.history(idx)
+        if hit is not None:
+            return hit
+        if self.is_warm(idx):
+            items, scores = self.score(idx, n, allowed, neighbours if allowed is None else None)
+            if len(items) >= n or self.aggregates is None:
+                return items, scores, "collaborative"
+            fill = self.popular(n - len(items), np.concatenate([items, history]), category, allowed)
+            return (np.concatenate([items, fill]), np.concatenate([scores, self.popularity_score(fill)]),
+                    "collaborative+popular")
+        if self.aggregates is None:
+            return None
+
+        with span("cold_start"):
+            seeds = [i for i in map(self.item_ids.get, interactions) if i is not None]
+            seeds = np.concatenate([history, np.asarray(seeds, dtype=np.int32)])
+            if len(seeds):
+                # Same path as session recommendations: co-occurrence of the seeds, topped up with popular items
+                items, source = self.session.recommend_indices(seeds, n, allowed), "co_occurrence"
+            else:
+                items, source = self.popular(n, category=category, allowed=allowed), "popular"
+            return items, self.popularity_score(items), source
+
+    def recommend_scored_many(self, user_ids, n=10):
+        """
+        recommend_scored() for several users, in order (None for users that cannot be
+        scored). The collaborative users' neighbour searches share one nearest_users_batch() call;
+        users answered by the materialized table skip it.
+        """
+        idxs = [self.user_index(u) for u in user_ids]
+        table = self.materialized
+        warm = [i for i, idx in enumerate(idxs) if self.is_warm(idx) and (table is None or table.lookup(idx, n) is None)]
+        neighbours = dict(zip(warm, self.nearest_users_batch([idxs[i] for i in warm], n))) if warm else {}
+        return [self.recommend_scored(u, n, neighbours=neighbours.get(i)) for i, u in enumerate(user_ids)]
+
+    def recommend(self, user_id, n=10):
+        """StockCodes recommended for `user_id`, or None if the user cannot be scored."""
+        scored = self.recommend_scored(user_id, n)
+        return None if scored is None else self.item_ids.decode(scored[0]).tolist()
+
+
+def load_recommender(model_path="models/recommender.pkl", id_map_dir=ID_MAP_DIR, id_maps=None, aggregates=None,
+                     filters=None):
+    """
+    Recommender for the trained artifact, or None if the model has not been trained yet.
+    Pass already loaded (user_ids, item_ids) as `id_maps` to share them with the caller,
+    the ETL aggregates to enable the cold-start path, and ItemFilters for constraints.
+    """
+    if not os.path.exists(model_path):
+        return None
+    with open(model_path, "rb") as f:
+        model = pickle.load(f)
+    user_ids, item_ids = id_maps or load_id_maps(id_map_dir)
+    return Recommender(model, user_ids, item_ids, aggregates, filters)
@@ -0,0 +1,74 @@
+from functools import lru_cache
+import numpy as np
+
+
+class ItemFilters:
+    """
+    Boolean item masks for constrained recommendations, indexed by item_idx.
+
+    One mask per category is precomputed, and items are kept sorted by price, so a
+    price range is two binary searches plus a slice. A request's constraints are then
+    combined into one mask before scoring instead of filtering a finished top-N list.
+    Combined masks are cached per (category, price range). Callers get a copy only when
+    they add an exclude list.
+    """
+
+    def __init__(self, item_category, categories, item_price):
+        """`item_category` holds positions in `categories` (-1 if unknown), `item_price` is NaN if unknown."""
+        self.n_items = len(item_category)
+        self.item_category = np.asarray(item_category)
+        self.categories = list(categories)
+        self.category_masks = np.zeros((len(self.categories), self.n_items), dtype=bool)
+        known = item_category >= 0
+        self.category_masks[item_category[known], np.flatnonzero(known)] = True
+        priced = np.flatnonzero(~np.isnan(item_price))
+        order = np.argsort(item_price[priced], kind="stable")
+        self.by_price = priced[order].astype(np.int32)
+        self.sorted_price = item_price[priced][order]
+        self._combined = lru_cache(maxsize=256)(self._combine)
+
+    @classmethod
+    def from_products(cls, df, item_ids):
+        """Masks from a products frame (StockCode, Category, Price); products unknown to `item_ids` are dropped."""
+        idx = item_ids.encode(df["StockCode"].astype(str))
+        ok = idx >= 0
+        categories = sorted(df["Category"].astype(str).unique().tolist())
+        item_category = np.full(len(item_ids), -1, dtype=np.int32)
+        item_category[idx[ok]] = np.searchsorted(categories, df["Category"].astype(str).to_numpy()[ok])
+        item_price = np.full(len(item_ids), np.nan)
+        item_price[idx[ok]] = df["Price"].to_numpy(dtype=np.float64)[ok]
+        return cls(item_category, categories, item_price)
+
+    def has_category(self, category):
+        return category is None or category == "All" or category in self.categories
+
+    def price_range(self, min_price=None, max_price=None):
+        """Item indices priced within [min_price, max_price], cheapest first."""
+        lo = 0 if min_price is None else np.searchsorted(self.sorted_price, min_price, side="left")
+        hi = len(self.sorted_price) if max_price is None else np.searchsorted(self.sorted_price, max_price, side="right")
+        return self.by_price[lo:hi]
+
+    def _combine(self, category, min_price, max_price):
+        if category is not None and category != "All":
+            if category not in self.categories:
+                return np.zeros(self.n_items, dtype=bool)
+            mask = self.category_masks[self.categories.index(category)]
+        else:
+            mask = np.ones(self.n_items, dtype=bool)
+        if min_price is not None or max_price is not None:
+            in_range = np.zeros(self.n_items, dtype=bool)
+            in_range[self.price_range(min_price, max_price)] = True
+            mask = mask & in_range
+        mask.flags.writeable = False
+        return mask
+
+    def mask(self, category=None, min_price=None, max_price=None, exclude=()):
+        """Allowed items as a read-only bool array, or None when nothing is constrained."""
+        if (category is None or category == "All") and min_price is None and max_price is None and not len(exclude):
+            return None
+        mask = self._combined(category, min_price, max_price)
+        if len(exclude):
+            exclude = np.asarray(exclude)
+            mask = mask.copy()
+            mask[exclude[(exclude >= 0) & (exclude < self.n_items)]] = False
+        return mask
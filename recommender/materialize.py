@@ -0,0 +1,235 @@
+"""
+Materialized top-N recommendations for every user in the trained model.
+
+`python -m recommender.materialize` scores all users after training, in parallel chunks,
+and writes models/materialized.npz. The file holds, per list width (10 for the default
+/recommend call and 30 for diversity re-ranking candidates), int32 item indices padded
+with -1, float16 scores, list lengths and the source of each list.
+
+It also stores what each list was computed from: a digest of every user's training row,
+each user's nearest neighbours with their similarities, and a digest of the ETL
+aggregates. A list is stale once any of those inputs changes. That happens when the user's
+own row changed, when one of their neighbours' rows changed, or when a user whose row
+changed is now at least as similar as their last stored neighbour. Cosine similarity of
+two users depends only on their two rows, so no other list can change. Lists that used
+popularity or co-occurrence go stale when the aggregates change. If the similarity between
+two unchanged users differs, the model was trained differently (another precision or
+method), and the whole table is stale. Stale users are scored live.
+
+    python -m recommender.materialize --widths 10,30 --workers 4
+"""
+import argparse, hashlib, os, time
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from recommender.engine import load_recommender
+
+MATERIALIZED_PATH = "models/materialized.npz"
+WIDTHS = (10, 30)
+SOURCES = ["collaborative", "collaborative+popular", "co_occurrence", "popular"]
+
+_engine = None  # set in the parent before forking so workers share its pages
+
+
+def row_digests(matrix):
+    """
+    A uint64 digest of each user's CSR row (items and ratings), order independent.
+    Each entry is hashed with multiply-xorshift mixing and the hashes are summed per row.
+    """
+    matrix = matrix.tocsr()
+    with np.errstate(over="ignore"):
+        entry = (matrix.indices.astype(np.uint64) + np.uint64(1)) * np.uint64(0x9E3779B97F4A7C15)
+        entry ^= np.asarray(matrix.data, dtype=np.float32).view(np.uint32).astype(np.uint64) * np.uint64(0xC2B2AE3D27D4EB4F)
+        entry ^= entry >> np.uint64(31)
+        entry *= np.uint64(0xBF58476D1CE4E5B9)
+        row = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+        digest = np.zeros(matrix.shape[0], dtype=np.uint64)
+        np.add.at(digest, row, entry)
+        digest += np.diff(matrix.indptr).astype(np.uint64) * np.uint64(0x94D049BB133111EB)
+    return digest
+
+
+def aggregates_digest(aggregates):
+    """Hex digest of the popularity and co-occurrence arrays ("" without aggregates)."""
+    if aggregates is None:
+        return ""
+    h = hashlib.blake2b(digest_size=16)
+    for key in sorted(aggregates.popularity):
+        h.update(key.encode())
+        h.update(np.ascontiguousarray(aggregates.popularity[key]).tobytes())
+    for part in (aggregates.cooc.indptr, aggregates.cooc.indices, aggregates.cooc.data):
+        h.update(np.ascontiguousarray(part).tobytes())
+    return h.hexdigest()
+
+
+def _stored_similarity(engine, rows, cols):
+    """Similarity of each row to its columns in the stored units (pre-scale for int8), as float32."""
+    return np.asarray(np.take_along_axis(engine.similarity[rows], cols, axis=1), dtype=np.float32)
+
+
+def _score_chunk(args):
+    start, stop, widths = args
+    rows = np.arange(start, stop)
+    codes = _engine.user_ids.codes[start:stop]
+    # One neighbour search at the widest list; each narrower list uses its prefix
+    neighbours = _engine.nearest_users_batch(rows, max(widths))
+    out = {"neighbours": (neighbours.astype(np.int32), _stored_similarity(_engine, rows, neighbours))}
+    for w in widths:
+        items = np.full((stop - start, w), -1, dtype=np.int32)
+        scores = np.zeros((stop - start, w), dtype=np.float16)
+        lengths = np.zeros(stop - start, dtype=np.int16)
+        sources = np.zeros(stop - start, dtype=np.uint8)
+        for i, code in enumerate(codes):
+            scored = _engine.recommend_scored(code, w, neighbours=neighbours[i, :w])
+            if scored is None:
+                continue
+            k = len(scored[0])
+            items[i, :k], scores[i, :k], lengths[i], sources[i] = scored[0], scored[1], k, SOURCES.index(scored[2])
+        out[w] = (items, scores, lengths, sources)
+    return start, out
+
+
+def build_materialized(engine, widths=WIDTHS, chunk=1024, workers=None):
+    """Arrays for every model user and each list width, scored in `chunk`-user pieces across `workers` processes."""
+    global _engine
+    _engine = engine
+    n_users = engine.n_users
+    k = min(max(widths), n_users - 1)
+    arrays = {"widths": np.asarray(widths, dtype=np.int16), "digests": row_digests(engine.matrix)[:n_users],
+              "aggregates_digest": np.asarray(aggregates_digest(engine.aggregates)),
+              "neighbours": np.zeros((n_users, k), dtype=np.int32),
+              "neighbour_similarity": np.zeros((n_users, k), dtype=np.float32)}
+    for w in widths:
+        arrays[f"items_{w}"] = np.full((n_users, w), -1, dtype=np.int32)
+        arrays[f"scores_{w}"] = np.zeros((n_users, w), dtype=np.float16)
+        arrays[f"lengths_{w}"] = np.zeros(n_users, dtype=np.int16)
+        arrays[f"sources_{w}"] = np.zeros(n_users, dtype=np.uint8)
+    tasks = [(lo, min(lo + chunk, n_users), tuple(widths)) for lo in range(0, n_users, chunk)]
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(tasks) > 1:
+        # fork: workers inherit the loaded engine instead of unpickling a copy each
+        with ProcessPoolExecutor(workers, mp_context=mp.get_context("fork")) as pool:
+            results = pool.map(_score_chunk, tasks)
+            _fill(arrays, results)
+    else:
+        _fill(arrays, map(_score_chunk, tasks))
+    return arrays
+
+
+def _fill(arrays, results):
+    for start, out in results:
+        neighbours, similarity = out.pop("neighbours")
+        arrays["neighbours"][start:start + len(neighbours)] = neighbours
+        arrays["neighbour_similarity"][start:start + len(neighbours)] = similarity
+        for w, (items, scores, lengths, sources) in out.items():
+            stop = start + len(lengths)
+            arrays[f"items_{w}"][start:stop] = items
+            arrays[f"scores_{w}"][start:stop] = scores
+            arrays[f"lengths_{w}"][start:stop] = lengths
+            arrays[f"sources_{w}"][start:stop] = sources
+
+
+def save_materialized(arrays, path=MATERIALIZED_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp.npz"
+    np.savez(tmp, **arrays)
+    os.replace(tmp, path)
+
+
+def _entered(similarity, changed, floor, chunk=4096):
+    """Rows of the first len(floor) users for which a `changed` user is at least as similar as `floor`."""
+    out = np.zeros(len(floor), dtype=bool)
+    for lo in range(0, len(floor), chunk):
+        hi = min(lo + chunk, len(floor))
+        block = np.asarray(similarity[lo:hi][:, changed], dtype=np.float32)
+        self_row, self_col = np.nonzero(changed[None, :] == np.arange(lo, hi)[:, None])
+        block[self_row, self_col] = -np.inf
+        out[lo:hi] = (block >= floor[lo:hi, None]).any(axis=1)
+    return out
+
+
+def _stale_rows(arrays, engine):
+    """Bool per model row: True where the stored list may differ from live scoring."""
+    n_users = engine.n_users
+    stale = np.ones(n_users, dtype=bool)
+    digests = arrays["digests"]
+    n = len(digests)
+    # Tables written before neighbours were stored, or for a model with fewer users, cannot be checked
+    if "neighbours" not in arrays or n > n_users:
+        return stale
+    stored_digest = str(arrays["aggregates_digest"])
+    current_digest = aggregates_digest(engine.aggregates)
+    if bool(stored_digest) != bool(current_digest):
+        # Loading or dropping the aggregates switches users between collaborative and cold-start scoring
+        return stale
+    neighbours, stored_sim = arrays["neighbours"], arrays["neighbour_similarity"]
+    changed = np.ones(n_users, dtype=bool)
+    changed[:n] = digests != row_digests(engine.matrix)[:n]
+    stale[:n] = changed[:n]
+    if neighbours.shape[1]:
+        stale[:n] |= changed[neighbours].any(axis=1)
+        moved = np.flatnonzero(changed)
+        if len(moved) and not stale[:n].all():
+            stale[:n] |= _entered(engine.similarity, moved, stored_sim[:, -1])
+        # Fresh rows kept all their inputs, so their stored similarities must be reproduced exactly
+        fresh = np.flatnonzero(~stale[:n])
+        if len(fresh) and not np.array_equal(_stored_similarity(engine, fresh, neighbours[fresh]), stored_sim[fresh]):
+            return np.ones(n_users, dtype=bool)
+    if stored_digest != current_digest:
+        collaborative = SOURCES.index("collaborative")
+        stale[:n] |= np.any([arrays[f"sources_{w}"] != collaborative for w in arrays["widths"].tolist()], axis=0)
+    return stale
+
+
+class MaterializedTable:
+    """Direct lookup of precomputed lists; users whose list inputs changed since the build are stale."""
+
+    def __init__(self, arrays, engine):
+        self.arrays = arrays
+        self.widths = set(arrays["widths"].tolist())
+        self.stale = _stale_rows(arrays, engine)
+
+    @property
+    def n_stale(self):
+        return int(self.stale.sum())
+
+    def lookup(self, idx, n):
+        """(item indices, float32 scores, source) for model row `idx`, or None if it must be scored live."""
+        if n not in self.widths or idx is None or idx >= len(self.stale) or self.stale[idx]:
+            return None
+        k = self.arrays[f"lengths_{n}"][idx]
+        return (self.arrays[f"items_{n}"][idx, :k], self.arrays[f"scores_{n}"][idx, :k].astype(np.float32),
+                SOURCES[self.arrays[f"sources_{n}"][idx]])
+
+
+def load_materialized(engine, path=MATERIALIZED_PATH):
+    """MaterializedTable checked against the loaded `engine`'s model and aggregates, or None if no table was built."""
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as f:
+        arrays = {k: f[k] for k in f.files}
+    return MaterializedTable(arrays, engine)
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    p.add_argument("--model", default="models/recommender.pkl")
+    p.add_argument("--out", default=MATERIALIZED_PATH)
+    p.add_argument("--widths", default=",".join(map(str, WIDTHS)), help="comma separated list lengths to store")
+    p.add_argument("--chunk", type=int, default=1024, help="users per work unit")
+    p.add_argument("--workers", type=int, default=None, help="processes (default: CPU count)")
+    a = p.parse_args(argv)
+
+    from etl.aggregates import load_aggregates, AGG_DIR
+    engine = load_recommender(a.model, aggregates=load_aggregates(AGG_DIR))
+    if engine is None:
+        raise SystemExit(f"No model at {a.model}; run python -m recommender.train_model first.")
+    start = time.perf_counter()
+    arrays = build_materialized(engine, [int(w) for w in a.widths.split(",")], a.chunk, a.workers)
+    save_materialized(arrays, a.out)
+    print(f"Saved {a.out}: {engine.n_users} users in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Lightweight price model: ridge regression of log price on item features.
+
+Features are the category one-hot, mean interaction rating, log order count and log mean
+quantity per order. Training is a closed-form solve over the catalog items with a known
+price. Scoring is one matrix-vector product over whole arrays, so the same inputs always
+give the same prices. Predictions for every catalog item are stored in the artifact, so
+serving known items is a single array gather.
+
+    python -m recommender.price_model
+"""
+import os
+import numpy as np
+import pandas as pd
+
+from etl.aggregates import AGG_DIR, load_aggregates
+from etl.id_maps import ID_MAP_DIR, load_id_maps
+from etl.store import build_catalog
+
+PRICE_MODEL_PATH = "models/price_model.npz"
+PRODUCTS = ["data/raw/products.csv", "data/processed/products.csv"]
+INTERACTIONS = "data/raw/interactions.csv"
+
+
+class PriceModel:
+    def __init__(self, categories, coef, intercept, mean, std, rating_fill, item_prediction=None):
+        self.categories = np.asarray(categories, dtype=str)
+        self.coef = np.asarray(coef, dtype=np.float64)
+        self.intercept = float(intercept)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.std = np.asarray(std, dtype=np.float64)
+        self.rating_fill = float(rating_fill)
+        self.item_prediction = np.empty(0, dtype=np.float32) if item_prediction is None else item_prediction
+
+    def features(self, category, rating, orders, quantity):
+        """Design matrix for array inputs; unknown categories get an all-zero one-hot."""
+        category = np.asarray(category, dtype=str)
+        onehot = (category[:, None] == self.categories[None, :]).astype(np.float64)
+        rating = np.asarray(rating, dtype=np.float64)
+        orders = np.asarray(orders, dtype=np.float64)
+        quantity = np.asarray(quantity, dtype=np.float64)
+        numeric = np.column_stack([
+            np.where(np.isnan(rating), self.rating_fill, rating),
+            np.log1p(orders),
+            np.log1p(np.divide(quantity, orders, out=np.zeros_like(quantity), where=orders > 0)),
+        ])
+        return np.hstack([onehot, (numeric - self.mean) / self.std])
+
+    def predict(self, category, rating, orders=0, quantity=0):
+        """Predicted prices for arrays of item features, rounded to paise."""
+        n = len(np.atleast_1d(category))
+        x = self.features(np.atleast_1d(category), np.broadcast_to(rating, n),
+                          np.broadcast_to(orders, n), np.broadcast_to(quantity, n))
+        return np.round(np.exp(x @ self.coef + self.intercept), 2)
+
+    def predict_items(self, item_idx):
+        """Stored predictions for item indices; NaN for indices outside the trained catalog."""
+        item_idx = np.asarray(item_idx, dtype=np.int64)
+        ok = (item_idx >= 0) & (item_idx < len(self.item_prediction))
+        out = np.full(len(item_idx), np.nan, dtype=np.float64)
+        out[ok] = self.item_prediction[item_idx[ok]]
+        return np.round(out, 2)
+
+    def save(self, path=PRICE_MODEL_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez(path, categories=self.categories, coef=self.coef, intercept=self.intercept, mean=self.mean,
+                 std=self.std, rating_fill=self.rating_fill, item_prediction=self.item_prediction)
+
+    @classmethod
+    def load(cls, path=PRICE_MODEL_PATH):
+        with np.load(path) as f:
+            return cls(f["categories"], f["coef"], f["intercept"], f["mean"], f["std"], f["rating_fill"],
+                       f["item_prediction"])
+
+
+def fit_price_model(category, rating, orders, quantity, price, alpha=1.0):
+    """Ridge fit of log(price); rows without a positive price are ignored."""
+    category = np.asarray(category, dtype=str)
+    rating = np.asarray(rating, dtype=np.float64)
+    rating_fill = np.nanmean(rating) if np.isfinite(rating).any() else 0.0
+    model = PriceModel(np.unique(category), np.zeros(0), 0.0, np.zeros(3), np.ones(3), rating_fill)
+    raw = model.features(category, rating, orders, quantity)[:, len(model.categories):]
+    model.mean, model.std = raw.mean(axis=0), np.where(raw.std(axis=0) > 0, raw.std(axis=0), 1.0)
+
+    price = np.asarray(price, dtype=np.float64)
+    ok = np.isfinite(price) & (price > 0)
+    x = model.features(category[ok], rating[ok], np.asarray(orders)[ok], np.asarray(quantity)[ok])
+    y = np.log(price[ok])
+    model.intercept = float(y.mean()) if len(y) else 0.0
+    # Closed-form ridge on the centered target: (X'X + aI) w = X'(y - b)
+    model.coef = np.linalg.solve(x.T @ x + alpha * np.eye(x.shape[1]), x.T @ (y - model.intercept))
+    return model
+
+
+def train_price_model(id_map_dir=ID_MAP_DIR, agg_dir=AGG_DIR, products_paths=PRODUCTS,
+                      interactions=INTERACTIONS, path=PRICE_MODEL_PATH):
+    _, items = load_id_maps(id_map_dir)
+    ratings = None
+    if os.path.exists(interactions):
+        df = pd.read_csv(interactions, usecols=["user_id", "product_id", "rating"], dtype={"user_id": str, "product_id": str})
+        ratings = pd.DataFrame({"item_idx": items.encode(df["product_id"]), "rating": df["rating"].to_numpy()})
+        ratings = ratings[ratings["item_idx"] >= 0]
+    catalog = build_catalog(items, products_paths, ratings)
+    aggregates = load_aggregates(agg_dir)
+    orders, quantity = np.zeros(len(items)), np.zeros(len(items))
+    if aggregates is not None:
+        # Items added to the id maps after the ETL ran have no order history yet
+        n = min(len(items), len(aggregates.popularity["orders"]))
+        orders[:n] = aggregates.popularity["orders"][:n]
+        quantity[:n] = aggregates.popularity["quantity"][:n]
+
+    model = fit_price_model(catalog["Category"], catalog["Rating"], orders, quantity, catalog["Price"])
+    model.item_prediction = model.predict(catalog["Category"], catalog["Rating"], orders, quantity).astype(np.float32)
+    model.save(path)
+    known = catalog["Price"].notna().to_numpy()
+    mape = np.mean(np.abs(model.item_prediction[known] - catalog["Price"][known]) / catalog["Price"][known]) if known.any() else float("nan")
+    print(f"Saved {path} ({known.sum()} priced items, MAPE {mape:.1%})")
+    return model
+
+
+def load_price_model(path=PRICE_MODEL_PATH):
+    """PriceModel from disk, or None if it has not been trained."""
+    return PriceModel.load(path) if os.path.exists(path) else None
+
+
+if __name__ == "__main__":
+    train_price_model()
@@ -0,0 +1,129 @@
+"""
+Reduced-precision storage for the trained model.
+
+The user-user similarity matrix is the bulk of the model (n_users^2 values). It can be
+stored as float64, float32, float16, or int8 with one float32 scale per row
+(value = int8 * scale[row], scaled to the row's largest off-diagonal value). The engine
+ranks neighbours directly on the stored values; a positive per-row scale does not change
+the order within a row. Only the reported scores are rescaled. Rating values are stored
+as float32, or for the two smaller formats as int16 when they are whole numbers that fit
+(scipy.sparse has no float16).
+
+`python -m recommender.quantize` reports, for each format, the memory and how well its
+neighbours and recommendations agree with a float64 baseline recomputed from the
+rating matrix:
+
+    python -m recommender.quantize --model models/recommender.pkl --sample 2000
+"""
+import argparse, json, pickle, sys, time
+import numpy as np
+
+PRECISIONS = ("float64", "float32", "float16", "int8")
+
+
+def quantize_similarity(sim, precision, chunk=4096):
+    """(stored array, per-row float32 scale or None) for a similarity matrix at `precision`."""
+    if precision not in PRECISIONS:
+        raise ValueError(f"unknown precision {precision!r}; choose from {', '.join(PRECISIONS)}")
+    if precision != "int8":
+        return np.asarray(sim).astype(precision, copy=False), None
+    scale = np.empty(sim.shape[0], dtype=np.float32)
+    out = np.empty(sim.shape, dtype=np.int8)
+    # Row chunks bound the float temporaries for large user counts
+    for lo in range(0, sim.shape[0], chunk):
+        rows = np.asarray(sim[lo:lo + chunk], dtype=np.float32)
+        hi = lo + len(rows)
+        # Scale to the largest off-diagonal value: self-similarity (1.0) is never a neighbour,
+        # and letting it set the scale would waste most of the 127 levels. The diagonal is clipped.
+        off = np.abs(rows)
+        off[np.arange(len(rows)), np.arange(lo, hi)] = 0
+        top = off.max(axis=1, initial=0) / 127
+        top[top == 0] = 1
+        out[lo:hi] = np.clip(np.rint(rows / top[:, None]), -127, 127)
+        scale[lo:hi] = top
+    return out, scale
+
+
+def _rating_dtype(data, precision):
+    if precision in ("float16", "int8") and len(data) and np.all(data == np.rint(data)) \
+            and np.abs(data).max() <= np.iinfo(np.int16).max:
+        return np.int16
+    return np.float32
+
+
+def quantize_model(model, precision):
+    """A copy of the model dict with similarity and rating values stored at `precision`."""
+    sim, scale = quantize_similarity(model["similarity"], precision)
+    matrix = model["matrix"].tocsr()
+    matrix = matrix.astype(_rating_dtype(matrix.data, precision))
+    out = dict(model, similarity=sim, matrix=matrix, precision=precision)
+    out.pop("similarity_scale", None)
+    if scale is not None:
+        out["similarity_scale"] = scale
+    return out
+
+
+def model_bytes(model):
+    mat = model["matrix"]
+    scale = model.get("similarity_scale")
+    return {"similarity": int(model["similarity"].nbytes) + (int(scale.nbytes) if scale is not None else 0),
+            "matrix": int(mat.data.nbytes + mat.indices.nbytes + mat.indptr.nbytes)}
+
+
+def agreement_report(model, precisions=PRECISIONS, sample=2000, n=10, seed=0):
+    """
+    Per precision: bytes, neighbour recall@n, recommendation recall@n and exact-list match
+    rate against float64, plus neighbour search time, over `sample` users.
+    """
+    from sklearn.metrics.pairwise import cosine_similarity
+    from etl.id_maps import IdMap
+    from recommender.engine import Recommender
+
+    matrix = model["matrix"].tocsr()
+    baseline = {"similarity": cosine_similarity(matrix.astype(np.float64)), "matrix": matrix}
+    n_users, n_items = matrix.shape
+    users, items = IdMap(np.arange(n_users)), IdMap(np.arange(n_items))
+    rows = np.random.default_rng(seed).choice(n_users, min(sample, n_users), replace=False)
+
+    def run(m):
+        engine = Recommender(m, users, items)
+        start = time.perf_counter()
+        neighbours = engine.nearest_users_batch(rows, n)
+        elapsed = time.perf_counter() - start
+        recs = [engine.score(r, n, users=nb)[0] for r, nb in zip(rows, neighbours)]
+        return neighbours, recs, elapsed / len(rows)
+
+    base_nb, base_recs, _ = run(baseline)
+    report = {}
+    for precision in precisions:
+        quantized = quantize_model(baseline, precision)
+        nb, recs, seconds = run(quantized)
+        report[precision] = {
+            "bytes": model_bytes(quantized),
+            "neighbour_recall": float(np.mean([len(np.intersect1d(a, b)) / max(len(a), 1) for a, b in zip(base_nb, nb)])),
+            "recommendation_recall": float(np.mean([len(np.intersect1d(a, b)) / max(len(a), 1)
+                                                    for a, b in zip(base_recs, recs)])),
+            "exact_list_match": float(np.mean([np.array_equal(a, b) for a, b in zip(base_recs, recs)])),
+            "neighbour_search_us": seconds * 1e6,
+        }
+    return report
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    p.add_argument("--model", default="models/recommender.pkl")
+    p.add_argument("--precisions", default=",".join(PRECISIONS), help="comma separated formats to compare")
+    p.add_argument("--sample", type=int, default=2000, help="users compared")
+    p.add_argument("--n", type=int, default=10, help="neighbours and list length")
+    a = p.parse_args(argv)
+    with open(a.model, "rb") as f:
+        model = pickle.load(f)
+    report = agreement_report(model, a.precisions.split(","), a.sample, a.n)
+    for precision, row in report.items():
+        print(f"{precision:8s} {row['bytes']['similarity'] / 2**20:9.1f} MB  neighbours {row['neighbour_recall']:.4f}  "
+              f"recs {row['recommendation_recall']:.4f}  exact {row['exact_list_match']:.4f}", file=sys.stderr)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import numpy as np
+
+METHODS = ("mmr", "quota")
+# Candidates scored per returned item when a list is re-ranked
+CANDIDATE_FACTOR = 3
+
+
+def _relevance(scores):
+    """Scores rescaled to [0, 1], so similarity and popularity scores weigh the same."""
+    scores = np.asarray(scores, dtype=np.float32)
+    top = scores.max(initial=0)
+    return scores / top if top > 0 else np.ones_like(scores)
+
+
+def _category_rank(cats, relevance=None):
+    """Position of each candidate within its category (by descending relevance, else candidate order)."""
+    keys = (np.arange(len(cats)), cats) if relevance is None else (np.arange(len(cats)), -relevance, cats)
+    by_cat = np.lexsort(keys)
+    sorted_cats = cats[by_cat]
+    group_start = np.flatnonzero(np.r_[True, sorted_cats[1:] != sorted_cats[:-1]])
+    rank = np.empty(len(cats), dtype=np.int64)
+    rank[by_cat] = np.arange(len(cats)) - np.repeat(group_start, np.diff(np.r_[group_start, len(cats)]))
+    return rank
+
+
+def mmr(items, scores, item_category, n, diversity=0.5):
+    """
+    Maximal marginal relevance over the candidates: each pick maximizes
+    (1 - diversity) * relevance - diversity * (similarity to anything already picked),
+    where two items are similar if they share a category.
+
+    With that similarity the greedy loop has a closed form. Within a category the most
+    relevant item is always picked first and costs no penalty. Every later item costs
+    exactly `diversity` from then on. So the greedy order is one sort by those fixed values,
+    with no per-pick loop.
+    """
+    items = np.asarray(items)
+    cats = item_category[items]
+    # Unknown categories (-1) are similar to nothing
+    relevance = _relevance(scores)
+    repeat = (_category_rank(cats, relevance) > 0) & (cats >= 0)
+    value = (1 - diversity) * relevance - diversity * repeat
+    order = np.argsort(-value, kind="stable")[:n]
+    return items[order], np.asarray(scores, dtype=np.float32)[order]
+
+
+def quota(items, scores, item_category, n, diversity=0.5):
+    """
+    Category quota: each category keeps at most max(1, round(n * (1 - diversity))) of the
+    top places, and the overflow moves behind them in score order.
+    """
+    items = np.asarray(items)
+    cats = item_category[items]
+    cap = max(1, int(round(n * (1 - diversity))))
+    # Unknown categories (-1) are never capped
+    over = (_category_rank(cats) >= cap) & (cats >= 0)
+    order = np.lexsort((np.arange(len(items)), over))[:n]
+    return items[order], np.asarray(scores, dtype=np.float32)[order]
+
+
+def rerank(method, items, scores, item_category, n, diversity=0.5):
+    """Top `n` of the candidates re-ranked by `method` ("mmr" or "quota")."""
+    if method == "mmr":
+        return mmr(items, scores, item_category, n, diversity)
+    if method == "quota":
+        return quota(items, scores, item_category, n, diversity)
+    raise ValueError(f"unknown re-ranking method {method!r}; choose from {', '.join(METHODS)}")
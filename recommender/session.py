@@ -0,0 +1,60 @@
+import numpy as np
+
+
+class SessionRecommender:
+    """
+    Item-to-item suggestions for the products viewed in the current session.
+
+    Scores are a recency-weighted sum of the viewed items' rows in the invoice
+    co-occurrence matrix built by the ETL. Each row is normalized so one very popular
+    item cannot drown out the others. Only the non-zeros of those few sparse rows are
+    touched, so a call costs O(total row length), not O(catalog), and can run on every click.
+    """
+
+    def __init__(self, aggregates, item_ids, decay=0.7):
+        self.cooc = aggregates.cooc
+        self.aggregates = aggregates
+        self.item_ids = item_ids
+        self.decay = decay
+
+    def recommend_indices(self, viewed, n=6, allowed=None):
+        """
+        Item indices for `viewed` (oldest first), topped up with popular items if needed.
+        Only items in the `allowed` bool mask (all items if None) are returned.
+        """
+        viewed = np.asarray(viewed, dtype=np.int64)
+        viewed = viewed[(viewed >= 0) & (viewed < self.cooc.shape[0])]
+        picked = np.empty(0, dtype=np.int64)
+        if len(viewed):
+            weights = self.decay ** np.arange(len(viewed))[::-1]  # the latest view weighs 1
+            starts, ends = self.cooc.indptr[viewed], self.cooc.indptr[viewed + 1]
+            lens = ends - starts
+            pos = np.repeat(starts - np.cumsum(lens) + lens, lens) + np.arange(lens.sum())
+            row = np.repeat(np.arange(len(viewed)), lens)
+            data = self.cooc.data[pos].astype(np.float64)
+            totals = np.maximum(np.bincount(row, weights=data, minlength=len(viewed)), 1)
+            values = data * (weights / totals)[row]
+            items, inverse = np.unique(self.cooc.indices[pos], return_inverse=True)
+            score = np.bincount(inverse, weights=values)
+            score[np.isin(items, viewed)] = 0
+            if allowed is not None:
+                score[~allowed[items]] = 0
+            k = min(n, len(items))
+            if k:
+                top = np.argpartition(-score, k - 1)[:k]
+                top = top[np.argsort(-score[top], kind="stable")]
+                picked = items[top[score[top] > 0]]
+        if len(picked) < n:
+            if allowed is None:
+                popular = self.aggregates.popular(n + len(viewed) + len(picked))
+            else:
+                popular = self.aggregates.popular(len(allowed))
+                popular = popular[allowed[popular]]
+            popular = popular[~np.isin(popular, np.concatenate([viewed, picked]))]
+            picked = np.concatenate([picked, popular[:n - len(picked)]])
+        return picked.astype(np.int32)
+
+    def recommend(self, codes, n=6):
+        """StockCodes suggested for the viewed `codes`; unknown codes are ignored."""
+        viewed = self.item_ids.encode(list(codes)) if len(codes) else np.empty(0, dtype=np.int32)
+        return self.item_ids.decode(self.recommend_indices(viewed[viewed >= 0], n)).tolist()
@@ -0,0 +1,149 @@
+"""
+Model arrays shared across API worker processes through memory-mapped files.
+
+The first worker to start publishes the trained model (similarity matrix and CSR rating
+matrix) as .npy files, along with the products payload as pre-encoded JSON. Publishing
+happens under a file lock into a versioned directory, and a `current.json` pointer is
+swapped in atomically. Every worker then maps the same files read-only. The pages live
+once in the OS page cache instead of once per process.
+
+Only those two artifacts are shared. Everything else is still built privately in each
+worker: the CatalogIndex with its similar-products table and search index, the item
+filters, aggregates, user profiles, price model and materialized table. That works because
+they grow with the product count, while the similarity matrix grows with the square of the
+user count. A CatalogIndex over 100k products takes about 8 MB per worker. The similarity
+matrix for 20k users is 1.6 GB at float32.
+
+    python -m recommender.shared_model      # publish ahead of time (optional)
+"""
+import fcntl, json, mmap, os, pickle, shutil
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+
+SHARED_DIR = "models/shared"
+POINTER = "current.json"
+ARRAYS = ["similarity", "matrix_data", "matrix_indices", "matrix_indptr"]
+
+
+def _version(*paths):
+    """Identity of the source files: their mtimes, so retraining republishes."""
+    return "-".join(str(os.stat(p).st_mtime_ns) if os.path.exists(p) else "0" for p in paths)
+
+
+def publish(model_path, directory=SHARED_DIR, products_path=None):
+    """Write the model arrays and products payload into a new version directory and point to it."""
+    version = _version(model_path, products_path or "")
+    target = os.path.join(directory, version)
+    shutil.rmtree(target, ignore_errors=True)
+    os.makedirs(target)
+    with open(model_path, "rb") as f:
+        model = pickle.load(f)
+    mat = model["matrix"].tocsr()
+    arrays = {"similarity": np.ascontiguousarray(model["similarity"]), "matrix_data": mat.data,
+              "matrix_indices": mat.indices, "matrix_indptr": mat.indptr}
+    if model.get("similarity_scale") is not None:
+        arrays["similarity_scale"] = model["similarity_scale"]
+    for name, arr in arrays.items():
+        np.save(os.path.join(target, name + ".npy"), arr)
+    manifest = {"version": version, "matrix_shape": list(mat.shape), "products_count": 0,
+                "precision": model.get("precision", "float64")}
+    if products_path and os.path.exists(products_path):
+        df = pd.read_csv(products_path)
+        with open(os.path.join(target, "products.json"), "w") as f:
+            f.write(df.to_json(orient="records"))
+        manifest["products_count"] = len(df)
+    with open(os.path.join(target, "manifest.json"), "w") as f:
+        json.dump(manifest, f)
+
+    tmp = os.path.join(directory, POINTER + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump({"version": version}, f)
+    os.replace(tmp, os.path.join(directory, POINTER))
+    # Older versions can go: workers still mapping them keep the unlinked pages alive
+    for name in os.listdir(directory):
+        if name != version and os.path.isdir(os.path.join(directory, name)):
+            shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+    return version
+
+
+class SharedModel:
+    """Read-only views over a published version: the model dict the engine expects, plus products JSON."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "manifest.json")) as f:
+            self.manifest = json.load(f)
+        arr = {name: np.load(os.path.join(path, name + ".npy"), mmap_mode="r") for name in ARRAYS}
+        # copy=False keeps the CSR components as views onto the mapped files
+        matrix = csr_matrix((arr["matrix_data"], arr["matrix_indices"], arr["matrix_indptr"]),
+                            shape=tuple(self.manifest["matrix_shape"]), copy=False)
+        self.model = {"similarity": arr["similarity"], "matrix": matrix, "matrix_shape": matrix.shape,
+                      "precision": self.manifest.get("precision", "float64")}
+        scale = os.path.join(path, "similarity_scale.npy")
+        if os.path.exists(scale):
+            self.model["similarity_scale"] = np.load(scale)
+        self._products = None
+        products = os.path.join(path, "products.json")
+        if os.path.exists(products) and os.path.getsize(products):
+            with open(products, "rb") as f:
+                self._products = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @property
+    def products_count(self):
+        return self.manifest["products_count"]
+
+    def products_json(self):
+        """The pre-encoded /products payload, or None if no products file was published."""
+        return None if self._products is None else self._products[:]
+
+
+def attach(directory=SHARED_DIR):
+    """SharedModel for the current published version, or None if nothing is published."""
+    pointer = os.path.join(directory, POINTER)
+    if not os.path.exists(pointer):
+        return None
+    with open(pointer) as f:
+        version = json.load(f)["version"]
+    return SharedModel(os.path.join(directory, version))
+
+
+def ensure_published(model_path, directory=SHARED_DIR, products_path=None):
+    """Attach to the published model, publishing first if it is missing or stale. None if no model is trained."""
+    if not os.path.exists(model_path):
+        return None
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, ".lock"), "w") as lock:
+        # Workers starting together serialize here; only the first one publishes
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            pointer = os.path.join(directory, POINTER)
+            current = None
+            if os.path.exists(pointer):
+                with open(pointer) as f:
+                    current = json.load(f)["version"]
+            if current != _version(model_path, products_path or ""):
+                publish(model_path, directory, products_path)
+            return attach(directory)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def process_memory():
+    """This process's resident memory in MB from /proc/self/status: total, anonymous and file/shm backed."""
+    fields = {}
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("VmRSS", "RssAnon", "RssFile", "RssShmem"):
+                    fields[key] = int(value.split()[0]) / 1024
+    except OSError:
+        import resource
+        return {"rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+    return {"rss_mb": fields.get("VmRSS"), "anon_mb": fields.get("RssAnon"),
+            "shared_mb": fields.get("RssFile", 0) + fields.get("RssShmem", 0)}
+
+
+if __name__ == "__main__":
+    print("Published", publish("models/recommender.pkl", SHARED_DIR, "data/processed/products.csv"), "to", SHARED_DIR)
@@ -0,0 +1,66 @@
+"""
+Request-scoped timing spans, shared by the API and the recommender.
+
+A Trace holds a request ID and a list of timed spans. traced() makes one current for a
+block (the API's TracingMiddleware does this per request; scripts can too). Code anywhere
+in the call path, including the recommender engine, records stages with `with span("name"):`.
+Outside a trace, span() is a no-op costing one context variable lookup.
+"""
+import contextvars, os, time
+from contextlib import contextmanager, nullcontext
+
+_current = contextvars.ContextVar("shopsense_trace", default=None)
+_NOOP = nullcontext()
+
+
+class Trace:
+    def __init__(self, request_id=None):
+        self.request_id = request_id or os.urandom(8).hex()
+        self.start = time.perf_counter()
+        self.spans = []
+
+    def add(self, name, start, end):
+        self.spans.append((name, (start - self.start) * 1000, (end - start) * 1000))
+
+    def totals(self):
+        """Milliseconds per span name, summed over repeats."""
+        out = {}
+        for name, _, ms in self.spans:
+            out[name] = out.get(name, 0.0) + ms
+        return {name: round(ms, 3) for name, ms in out.items()}
+
+
+def current():
+    return _current.get()
+
+
+@contextmanager
+def traced(request_id=None):
+    """Run a block under a new Trace (the middleware does this per request; scripts can too)."""
+    trace = Trace(request_id)
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+
+class _Span:
+    # A slotted class rather than @contextmanager: about a quarter of the cost per span
+    __slots__ = ("trace", "name", "start")
+
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.trace.add(self.name, self.start, time.perf_counter())
+
+
+def span(name):
+    """Context manager timing `name` into the current trace, if there is one."""
+    trace = _current.get()
+    return _NOOP if trace is None else _Span(trace, name)
@@ -1,24 +1,42 @@
-
-import pandas as pd, os, pickle
+import argparse, pandas as pd, numpy as np, os, pickle
+from scipy.sparse import csr_matrix
 from sklearn.metrics.pairwise import cosine_similarity
-def train():
-    # Prefer processed pivot
+
+from etl.id_maps import ID_MAP_DIR, load_id_maps, save_id_maps
+from recommender.quantize import PRECISIONS, quantize_model
+
+
+def load_ratings():
+    """Long-form (user_id, product_id, rating) rows, preferring the processed pivot."""
     ppath = 'data/processed/user_item_matrix.csv'
     if os.path.exists(ppath):
         uif = pd.read_csv(ppath)
-        users = uif.iloc[:,0].tolist()
-        mat = uif.iloc[:,1:].values
-        products = list(uif.columns)[1:]
-    else:
-        df = pd.read_csv('data/raw/interactions.csv')
-        pivot = df.pivot_table(index='user_id', columns='product_id', values='rating', aggfunc='sum', fill_value=0)
-        users = pivot.index.tolist()
-        mat = pivot.values
-        products = pivot.columns.tolist()
+        uif = uif.rename(columns={uif.columns[0]: 'user_id'})
+        df = uif.melt(id_vars='user_id', var_name='product_id', value_name='rating')
+        return df[df['rating'] != 0]
+    df = pd.read_csv('data/raw/interactions.csv')
+    return df.groupby(['user_id', 'product_id'], as_index=False)['rating'].sum()
+
+
+def train(id_map_dir=ID_MAP_DIR, precision='float32'):
+    """Fit and save the model, storing similarity at `precision` (see recommender.quantize)."""
+    df = load_ratings()
+    # Rows/columns follow the shared id maps, so serving can index them with the same ints
+    users, items = load_id_maps(id_map_dir)
+    if users.extend(df['user_id']) + items.extend(df['product_id']):
+        save_id_maps(users, items, id_map_dir)
+    rows = users.encode(df['user_id'])
+    cols = items.encode(df['product_id'])
+    mat = csr_matrix((df['rating'].to_numpy(dtype=np.float32), (rows, cols)), shape=(len(users), len(items)))
     sim = cosine_similarity(mat)
-    model = {'users': users, 'products': products, 'similarity': sim, 'matrix_shape': mat.shape}
+    model = {'users': users.codes.tolist(), 'products': items.codes.tolist(), 'similarity': sim,
+             'matrix': mat, 'matrix_shape': mat.shape}
+    model = quantize_model(model, precision)
     os.makedirs('models', exist_ok=True)
     with open('models/recommender.pkl','wb') as f: pickle.dump(model,f)
-    print('Saved models/recommender.pkl')
+    print(f'Saved models/recommender.pkl ({precision} similarity)')
 if __name__ == '__main__':
-    train()
+    p = argparse.ArgumentParser(description='Train the user-based recommender.')
+    p.add_argument('--precision', default='float32', choices=PRECISIONS,
+                   help='similarity storage; compare formats with python -m recommender.quantize')
+    train(precision=p.parse_args().precision)
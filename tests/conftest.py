@@ -0,0 +1,4 @@
+import os, sys
+
+# Modules are imported from the project root (`from etl.store import ...`), as the scripts do
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+
+from etl.id_maps import IdMap
+from etl.store import build_store, catalog_frame, open_store
+from recommender.catalog import merged_catalog
+
+
+def test_catalog_index_matches_store_prices_and_ratings(tmp_path):
+    rng = np.random.default_rng(0)
+    codes = [f"P{100000 + i}" for i in range(40)]
+    raw, processed = tmp_path / "raw_products.csv", tmp_path / "products.csv"
+    pd.DataFrame({"StockCode": codes[:35], "Description": "Item", "Price": rng.uniform(5, 500, 35).round(2)}).to_csv(raw, index=False)
+    pd.DataFrame({"StockCode": codes[:8], "Description": "Shoe", "Category": "Footwear"}).to_csv(processed, index=False)
+    interactions = tmp_path / "interactions.csv"
+    pd.DataFrame({"user_id": rng.integers(1, 20, 300).astype(str), "product_id": rng.choice(codes, 300),
+                  "rating": rng.integers(1, 6, 300)}).to_csv(interactions, index=False)
+    transactions = tmp_path / "transactions.csv"
+    pd.DataFrame({"InvoiceNo": ["1", "2"], "user_idx": [0, 1], "item_idx": [0, 1], "Quantity": [1, 2]}).to_csv(transactions, index=False)
+    users, items = IdMap([str(u) for u in range(1, 20)]), IdMap(codes)
+    paths = [str(raw), str(processed)]
+
+    db = str(tmp_path / "shopsense.db")
+    build_store(users, items, str(transactions), str(interactions), paths, db)
+    store = open_store(db)
+    catalog = merged_catalog(catalog_frame(users, items, paths, str(interactions)))
+
+    assert len(catalog) == len(codes)
+    for code in codes:
+        stored = store.product(code)
+        row = catalog.rows([code]).iloc[0]
+        assert row["Category"] == stored["Category"]
+        for col in ("Price", "Rating"):
+            assert row[col] == (stored[col] if stored[col] is not None else 0.0)
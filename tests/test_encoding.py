@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from api import encoding
+
+
+@pytest.mark.parametrize("accept, expected", [
+    (None, encoding.JSON),
+    ("", encoding.JSON),
+    ("application/json", encoding.JSON),
+    ("*/*", encoding.JSON),
+    (encoding.PACKED, encoding.PACKED),
+    (f"application/json;q=0.5, {encoding.PACKED}", encoding.PACKED),
+    (f"{encoding.PACKED};q=0.4, application/json;q=0.9", encoding.JSON),
+    ("text/html", encoding.JSON),
+])
+def test_negotiate_prefers_highest_q(accept, expected):
+    assert encoding.negotiate(accept) == expected
+
+
+@pytest.mark.parametrize("accept", [
+    f"{encoding.PACKED};q=0",
+    f"{encoding.PACKED};q=0.0, text/html",
+    f"{encoding.PACKED};q=-1",
+    f"{encoding.PACKED};q=abc",
+])
+def test_negotiate_refuses_q_zero(accept):
+    assert encoding.negotiate(accept) == encoding.JSON
+
+
+def test_negotiate_q_zero_wildcard_does_not_match():
+    assert encoding.negotiate(f"*/*;q=0, {encoding.PACKED};q=0.1") == encoding.PACKED
+
+
+def test_packed_round_trip():
+    items, scores = np.array([3, 1, 4], dtype=np.int32), np.array([0.9, 0.5, 0.25], dtype=np.float32)
+    out_items, out_scores = encoding.unpack_recommendations(encoding.pack_recommendations(items, scores))
+    np.testing.assert_array_equal(out_items, items)
+    np.testing.assert_array_equal(out_scores, scores)
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.sparse import csr_matrix
+from sklearn.metrics.pairwise import cosine_similarity
+
+from etl.id_maps import IdMap
+from etl.store import build_catalog
+from recommender.engine import Recommender
+from recommender.filters import ItemFilters
+
+N_USERS, N_ITEMS = 40, 60
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    """Catalog merged the way the API does it: prices from the raw products, categories for a few items."""
+    rng = np.random.default_rng(0)
+    codes = [f"P{100000 + i}" for i in range(N_ITEMS)]
+    raw = tmp_path / "raw_products.csv"
+    pd.DataFrame({"StockCode": codes, "Description": [f"Product_{i}" for i in range(N_ITEMS)],
+                  "Price": np.round(rng.uniform(5, 250, N_ITEMS), 2)}).to_csv(raw, index=False)
+    processed = tmp_path / "products.csv"
+    pd.DataFrame({"StockCode": codes[:10], "Description": "Shoe", "Category": "Footwear"}).to_csv(processed, index=False)
+    items = IdMap(codes)
+    return items, build_catalog(items, [str(raw), str(processed)])
+
+
+@pytest.fixture
+def engine(catalog):
+    items, df = catalog
+    rng = np.random.default_rng(1)
+    ratings = rng.integers(1, 6, (N_USERS, N_ITEMS)) * (rng.random((N_USERS, N_ITEMS)) < 0.3)
+    matrix = csr_matrix(ratings.astype(np.float32))
+    model = {"matrix": matrix, "similarity": cosine_similarity(matrix).astype(np.float32)}
+    users = IdMap([str(u) for u in range(N_USERS)])
+    return Recommender(model, users, items, filters=ItemFilters.from_products(df, items))
+
+
+def test_catalog_uses_raw_prices_and_default_category(catalog):
+    _, df = catalog
+    assert df["Price"].notna().all()
+    assert set(df["Category"]) == {"Footwear", "General"}
+
+
+def test_price_range_matches_catalog_prices(engine, catalog):
+    _, df = catalog
+    prices = df["Price"].to_numpy()
+    for user in ["0", "7", "21"]:
+        items, _, _ = engine.recommend_scored(user, 10, max_price=60)
+        assert len(items) > 0
+        assert (prices[items] <= 60).all()
+        items, _, _ = engine.recommend_scored(user, 10, min_price=100, max_price=200)
+        assert ((prices[items] >= 100) & (prices[items] <= 200)).all()
+
+
+def test_category_matches_catalog_categories(engine, catalog):
+    _, df = catalog
+    assert engine.filters.has_category("General")
+    for category in ["General", "Footwear"]:
+        for user in ["0", "7", "21"]:
+            items, _, _ = engine.recommend_scored(user, 10, category=category)
+            assert (df["Category"].to_numpy()[items] == category).all()
+    items, _, _ = engine.recommend_scored("3", 10, category="General", max_price=60)
+    assert len(items) > 0
+    assert (df["Category"].to_numpy()[items] == "General").all() and (df["Price"].to_numpy()[items] <= 60).all()
+
+
+def test_exclude_and_unconstrained(engine):
+    assert engine.filters.mask() is None
+    items, _, _ = engine.recommend_scored("5", 10)
+    excluded = engine.item_ids.decode(items[:3]).tolist()
+    constrained, _, _ = engine.recommend_scored("5", 10, exclude=excluded)
+    assert not set(items[:3]) & set(constrained)
+
+
+def test_exclude_without_filters(engine):
+    engine.filters = None
+    for user in ["5", "12"]:
+        items, _, _ = engine.recommend_scored(user, 10)
+        excluded = engine.item_ids.decode(items[:3]).tolist()
+        constrained, _, _ = engine.recommend_scored(user, 10, exclude=excluded)
+        assert len(constrained) > 0
+        assert not set(items[:3]) & set(constrained)
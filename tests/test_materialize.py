@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.sparse import csr_matrix
+from sklearn.metrics.pairwise import cosine_similarity
+
+from etl.aggregates import Aggregates, build_aggregates
+from etl.id_maps import IdMap
+from recommender.engine import Recommender
+from recommender.materialize import MaterializedTable, build_materialized
+from recommender.quantize import quantize_model
+
+N_USERS, N_ITEMS = 80, 50
+
+
+def _ratings(seed=0):
+    rng = np.random.default_rng(seed)
+    ratings = rng.integers(1, 6, (N_USERS, N_ITEMS)) * (rng.random((N_USERS, N_ITEMS)) < 0.15)
+    ratings[:5] = 0
+    ratings[:5, :2] = 4  # a few cold-start users (fewer than MIN_HISTORY items)
+    return ratings
+
+
+def _aggregates(seed=0):
+    rng = np.random.default_rng(seed)
+    tx = pd.DataFrame({"InvoiceNo": rng.integers(0, 200, 1000).astype(str), "item_idx": rng.integers(0, N_ITEMS, 1000),
+                       "Quantity": rng.integers(1, 4, 1000)})
+    return Aggregates(*build_aggregates(tx, N_ITEMS, np.array(["General"] * N_ITEMS, dtype=object)))
+
+
+def _engine(ratings, aggregates, precision=None):
+    matrix = csr_matrix(ratings.astype(np.float32))
+    model = {"matrix": matrix, "similarity": cosine_similarity(matrix).astype(np.float32)}
+    if precision is not None:
+        model = quantize_model(model, precision)
+    return Recommender(model, IdMap([str(u) for u in range(N_USERS)]), IdMap([f"P{i}" for i in range(N_ITEMS)]),
+                       aggregates)
+
+
+@pytest.fixture
+def built():
+    aggregates = _aggregates()
+    engine = _engine(_ratings(), aggregates)
+    return engine, aggregates, build_materialized(engine, (10, 30), chunk=32, workers=1)
+
+
+def _assert_fresh_match_live(engine, table):
+    assert table.n_stale < engine.n_users
+    for idx in np.flatnonzero(~table.stale):
+        for n in (10, 30):
+            items, scores, source = table.lookup(idx, n)
+            live = engine.recommend_scored(engine.user_ids.codes[idx], n)
+            np.testing.assert_array_equal(items, live[0])
+            np.testing.assert_allclose(scores, live[1], rtol=1e-3)
+            assert source == live[2]
+
+
+def test_unchanged_model_has_no_stale_users(built):
+    engine, _, arrays = built
+    table = MaterializedTable(arrays, engine)
+    assert table.n_stale == 0
+    _assert_fresh_match_live(engine, table)
+
+
+def test_changed_rows_invalidate_their_lists_and_their_neighbours(built):
+    _, aggregates, arrays = built
+    ratings = _ratings()
+    ratings[[10, 40]] = np.random.default_rng(5).integers(1, 6, (2, N_ITEMS)) * (ratings[[11, 41]] > 0)
+    engine = _engine(ratings, aggregates)
+    table = MaterializedTable(arrays, engine)
+    assert table.stale[[10, 40]].all()
+    # Users whose neighbours were the changed ones are stale too, not just the changed users
+    assert table.n_stale > 2
+    _assert_fresh_match_live(engine, table)
+
+
+def test_other_precision_drops_the_table(built):
+    _, aggregates, arrays = built
+    assert MaterializedTable(arrays, _engine(_ratings(), aggregates, "int8")).n_stale == N_USERS
+
+
+def test_changed_aggregates_invalidate_popularity_lists(built):
+    _, _, arrays = built
+    engine = _engine(_ratings(), _aggregates(seed=1))
+    table = MaterializedTable(arrays, engine)
+    assert table.stale[:5].all()
+    _assert_fresh_match_live(engine, table)
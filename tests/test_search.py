@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+from api.app import MAX_SEARCH_LIMIT, app
+from recommender import search
+from recommender.search import SearchIndex
+
+WORDS = ["red", "blue", "cotton", "shirt", "lamp", "mug", "vintage", "glass", "wooden", "heart", "lantern", "cushion"]
+
+
+@pytest.fixture(scope="module")
+def index():
+    rng = np.random.default_rng(0)
+    n = 3000
+    desc = [" ".join(rng.choice(WORDS, 3)) + f" x{rng.integers(0, 500)}" for _ in range(n)]
+    return SearchIndex(pd.DataFrame({"StockCode": [f"P{100000 + i}" for i in range(n)], "Description": desc,
+                                     "Rating": rng.uniform(1, 5, n).round(1)}))
+
+
+QUERIES = ["red", "cot", "otto", "red shirt", "antern", "x12", "x123 mug", "p1000", "P100042", "p10004 red", "zzz", "-"]
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_sparse_and_dense_paths_agree(index, monkeypatch, query):
+    mask = np.random.default_rng(1).random(index.n) < 0.5
+    results = {}
+    for ratio in (0, 10 ** 9):  # 0: always intersect postings, huge: always dense
+        monkeypatch.setattr(search, "SPARSE_RATIO", ratio)
+        results[ratio] = [index.search(query, limit, m) for limit in (20, None) for m in (None, mask)]
+    for sparse, dense in zip(results[0], results[10 ** 9]):
+        np.testing.assert_array_equal(sparse, dense)
+
+
+def test_every_result_matches_all_tokens(index):
+    rows = index.search("red shirt", None)
+    assert len(rows)
+    for r in rows:
+        tokens = index.vocab[np.flatnonzero([(index.tok_rows[index.tok_offsets[t]:index.tok_offsets[t + 1]] == r).any()
+                                             for t in range(len(index.vocab))])]
+        assert any(t.startswith("red") for t in tokens) and any(t.startswith("shirt") for t in tokens)
+
+
+@pytest.mark.parametrize("limit, status", [(-1, 422), (0, 422), (MAX_SEARCH_LIMIT + 1, 422), (5, 200)])
+def test_search_endpoint_bounds_limit(limit, status):
+    response = TestClient(app).get("/products/search", params={"q": "red", "limit": limit})
+    assert response.status_code == status